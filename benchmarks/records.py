@@ -0,0 +1,97 @@
+"""
+Compare the memory held by the instances of a large list response
+for each hydration mode with tracemalloc.
+
+The decoded response is traced with the instances since lazy
+instances keep their entry, the other modes only keep its values.
+
+Usage::
+
+    python benchmarks/records.py [--count 100000]
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from leetchi.api import LeetchiAPI  # noqa
+from leetchi.query import SelectQuery  # noqa
+from leetchi.resources import Operation, Wallet  # noqa
+
+
+PROJECTIONS = {
+    Operation: ('amount', 'wallet', 'user'),
+    Wallet: ('name', 'users'),
+}
+
+MODES = [
+    ('models', lambda query: query),
+    ('lazy models', lambda query: query.lazy()),
+    ('models (projection)', lambda query: query.only(*PROJECTIONS[query.model])),
+    ('records', lambda query: query.records()),
+    ('records (projection)', lambda query: query.records().only(*PROJECTIONS[query.model])),
+]
+
+
+def get_entries(model, count):
+    if model is Wallet:
+        return [{
+            'ID': i,
+            'Name': 'Wallet %d' % i,
+            'Owners': [i, i + 1, i + 2],
+            'RaisingGoalAmount': 1200,
+            'CollectedAmount': 0,
+            'CreationDate': 1388534400 + i,
+        } for i in range(count)]
+
+    return [{
+        'ID': i,
+        'UserID': i % 1000,
+        'WalletID': i % 100,
+        'Amount': 1000 + i,
+        'TransactionType': 'contribution',
+        'TransactionID': i * 3,
+        'CreationDate': 1388534400 + i,
+        'UpdateDate': 1388534400 + i,
+    } for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--count', type=int, default=100000)
+    args = parser.parse_args()
+
+    handler = LeetchiAPI('benchmark', None)
+
+    for model in (Operation, Wallet):
+        for name, configure in MODES:
+            query = configure(SelectQuery(model))
+
+            gc.collect()
+            tracemalloc.start()
+
+            # the decoded response is traced too, lazy instances keep their entry
+            entries = get_entries(model, args.count)
+
+            start = time.time()
+            instances = [query.build_result(entry, handler) for entry in entries]
+            elapsed = time.time() - start
+
+            del entries
+
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            print('%-10s %-25s %8.1f MB | %6d bytes/instance | %6.2f us/instance' % (
+                model.__name__, name, current / 1e6, current / len(instances),
+                elapsed * 1e6 / len(instances)))
+
+            del instances
+
+
+if __name__ == '__main__':
+    main()
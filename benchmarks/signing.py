@@ -0,0 +1,100 @@
+"""
+Compare the signer backends on the payloads produced by real traffic.
+
+Usage::
+
+    python benchmarks/signing.py [--key /path/to/key.pem --password secret]
+
+Without a key, a 2048 bits RSA key is generated for the run.
+"""
+import argparse
+import os
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from leetchi.api import LeetchiAPI  # noqa
+from leetchi.signing import get_available_backends  # noqa
+
+
+PAYLOADS = [
+    ('GET', '/users/1234', None),
+    ('GET', '/users/1234/operations', None),
+    ('POST', '/users/', {
+        'FirstName': 'Mark',
+        'LastName': 'Zuckerberg',
+        'Email': 'mark@leetchi.com',
+        'IP': '127.0.0.1',
+        'Tag': 'custom_information',
+        'Nationality': 'FR',
+        'PersonType': 'NATURAL_PERSON',
+        'Birthday': 1388534400,
+    }),
+    ('POST', '/contributions/', {
+        'UserID': 1234,
+        'WalletID': 5678,
+        'Amount': 1000,
+        'ClientFeeAmount': 0,
+        'ReturnURL': 'http://my-website/back-url',
+        'Tag': 'contribution',
+    }),
+    ('PUT', '/wallets/5678/', {
+        'Name': 'Mark Zuckerberg wallet',
+        'Description': 'Wallet of Mark Zuckerberg',
+        'RaisingGoalAmount': 1200,
+        'Owners': [1234],
+        'Tag': 'user',
+    }),
+]
+
+
+def generate_key(password):
+    from Crypto.PublicKey import RSA
+
+    key = RSA.generate(2048)
+
+    return key.exportKey(passphrase=password).decode('utf-8')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--key', help='path to a PEM private key')
+    parser.add_argument('--password', default='secret')
+    parser.add_argument('--number', type=int, default=200)
+    args = parser.parse_args()
+
+    if args.key:
+        private_key = open(args.key).read()
+    else:
+        private_key = generate_key(args.password)
+
+    timestamp = int(time.time())
+
+    for backend in get_available_backends():
+        handler = LeetchiAPI('benchmark', args.password,
+                             private_key=private_key,
+                             signer=backend)
+
+        data = [handler._format_data(method, url + '?ts=%d' % timestamp, body)
+                for method, url, body in PAYLOADS]
+
+        # the first signature pays the key import
+        start = time.time()
+        handler.signer.sign(data[0])
+        first = time.time() - start
+
+        def run():
+            for entry in data:
+                handler.signer.sign(entry)
+
+        elapsed = timeit.timeit(run, number=args.number)
+        count = args.number * len(data)
+
+        print('%-15s first: %8.3f ms | %8.1f signatures/s | %6.3f ms/signature' % (
+            backend, first * 1000, count / elapsed, elapsed * 1000 / count))
+
+
+if __name__ == '__main__':
+    main()
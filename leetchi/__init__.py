@@ -4,6 +4,10 @@ private_key_path = None
 private_key_password = None
 sandbox = True
 host = None
+signer = None
+signing_processes = None
+timeout = None
+codec = None
 
 version = (0, 4)
 
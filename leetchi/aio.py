@@ -0,0 +1,411 @@
+"""
+Asyncio support, requires Python 3.5+ and aiohttp.
+"""
+import asyncio
+import time
+
+from contextlib import contextmanager
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
+from .api import LeetchiAPI, logger, copy_response
+from .exceptions import APIError
+from .signals import request_started, pre_save
+from .utils import ContextMap
+
+
+class AsyncResponse(object):
+    """
+    Expose the attributes of a ``requests`` response used
+    by ``LeetchiAPI`` on a fully read aiohttp response.
+    """
+
+    def __init__(self, status_code, headers, content, encoding=None):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.encoding = encoding or 'utf-8'
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, 'replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+
+# the loader of each handler in the current context
+_loaders = ContextMap('leetchi_loader')
+
+
+class DataLoader(object):
+    """
+    Gather the lookups by primary key issued within ``window`` seconds,
+    dedupe them and fetch them together with at most ``concurrency``
+    requests in flight, each caller awaits its own instance.
+    """
+
+    def __init__(self, window=0.002, concurrency=10):
+        self.window = window
+        self.concurrency = concurrency
+
+        self._futures = {}
+        self._queue = []
+        self._handle = None
+        self._semaphore = None
+
+    def load(self, query, reference, handler):
+        # a projected lookup cannot be shared with a full one
+        key = (query.model, reference, query.projection, id(handler))
+
+        future = self._futures.get(key)
+
+        if future is None:
+            loop = asyncio.get_event_loop()
+
+            future = loop.create_future()
+
+            self._futures[key] = future
+            self._queue.append((key, query, reference, handler))
+
+            if self._handle is None:
+                self._handle = loop.call_later(self.window, self.dispatch)
+
+        # a cancelled caller must not cancel the lookup shared with the others
+        return asyncio.shield(future)
+
+    def dispatch(self):
+        queue, self._queue, self._handle = self._queue, [], None
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        for key, query, reference, handler in queue:
+            asyncio.ensure_future(self._fetch(key, query, reference, handler))
+
+    async def _fetch(self, key, query, reference, handler):
+        future = self._futures[key]
+
+        try:
+            async with self._semaphore:
+                instance = await _select_get(query, reference, handler)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+        else:
+            if not future.done():
+                future.set_result(instance)
+        finally:
+            self._futures.pop(key, None)
+
+
+class AsyncLeetchiAPI(LeetchiAPI):
+    """
+    A handler which sends requests with a pooled aiohttp session,
+    ``request`` is a coroutine.
+
+    ``limit`` is the total number of pooled connections and
+    ``limit_per_host`` the number of connections per host (0 means no limit).
+    """
+
+    def __init__(self, *args, **kwargs):
+        if aiohttp is None:
+            raise ImportError('aiohttp is required to use %s' % self.__class__.__name__)
+
+        self.limit = kwargs.pop('limit', 100)
+        self.limit_per_host = kwargs.pop('limit_per_host', 0)
+
+        super(AsyncLeetchiAPI, self).__init__(*args, **kwargs)
+
+        self._client = None
+        self._inflight = {}
+
+    @property
+    def session(self):
+        if self._client is None or self._client.closed:
+            connector = aiohttp.TCPConnector(limit=self.limit,
+                                             limit_per_host=self.limit_per_host)
+
+            self._client = aiohttp.ClientSession(connector=connector)
+
+        return self._client
+
+    @contextmanager
+    def batching(self, window=0.002, concurrency=10):
+        """
+        Batch the ``aget`` calls issued in the block by the coroutines
+        sharing its context, nested blocks share the outermost loader.
+        """
+        current = _loaders.get(self)
+
+        if current is not None:
+            yield current
+            return
+
+        token = _loaders.set(self, DataLoader(window, concurrency))
+
+        try:
+            yield _loaders.get(self)
+        finally:
+            _loaders.reset(token)
+
+    def get_loader(self):
+        return _loaders.get(self)
+
+    def get_client_timeout(self):
+        timeout = self.get_timeout()
+
+        if timeout is None:
+            return aiohttp.ClientTimeout(total=None)
+
+        if not isinstance(timeout, tuple):
+            timeout = (timeout, timeout)
+
+        connect, read = timeout
+
+        return aiohttp.ClientTimeout(total=None, sock_connect=connect, sock_read=read)
+
+    async def _send(self, method, url, data=None, idempotency_key=None):
+        loop = asyncio.get_event_loop()
+
+        # signing is CPU bound, keep it out of the event loop
+        url, headers, data = await loop.run_in_executor(None, self._prepare_request,
+                                                        method, url, data, idempotency_key)
+
+        timeout = self.get_client_timeout()
+
+        logger.info(u'DATA[IN -> %s]\n\t- headers: %s\n\t- content: %s' % (url, headers, data))
+
+        ts = time.time()
+
+        request_started.send(url=url, data=data, headers=headers, method=method)
+
+        async with self.session.request(method, url,
+                                        headers=headers,
+                                        data=data,
+                                        timeout=timeout) as response:
+            content = await response.read()
+
+        result = AsyncResponse(response.status,
+                               response.headers,
+                               content,
+                               response.get_encoding() if content else None)
+
+        laps = time.time() - ts
+
+        return result, url, headers, data, laps
+
+    async def _send_hedged(self, method, url, data=None, idempotency_key=None):
+        delay = self.hedging.get_delay()
+
+        if delay is None:
+            response = await self._send(method, url, data, idempotency_key)
+        else:
+            tasks = [asyncio.ensure_future(self._send(method, url, data, idempotency_key))]
+
+            done, pending = await asyncio.wait(tasks, timeout=delay)
+
+            if not done:
+                logger.info(u'HEDGE[%s %s] after %2.3f seconds' % (method, url, delay))
+
+                tasks.append(asyncio.ensure_future(self._send(method, url, data, idempotency_key)))
+
+                done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+
+                winner = done.pop()
+
+                # fall back on the other attempt when the first one to finish failed
+                if winner.exception() is not None and pending:
+                    winner = pending.pop()
+
+                    await asyncio.wait([winner])
+
+                for task in tasks:
+                    if task is not winner:
+                        task.cancel()
+            else:
+                winner = done.pop()
+
+            response = winner.result()
+
+        self.hedging.add(response[-1])
+
+        return response
+
+    async def request(self, method, url, data=None, idempotency_key=None):
+        if not self.coalesce or method != 'GET':
+            return await self._request(method, url, data, idempotency_key)
+
+        key = (method, url)
+
+        task = self._inflight.get(key)
+
+        leader = task is None
+
+        if leader:
+            task = asyncio.ensure_future(self._request(method, url, data, idempotency_key))
+
+            self._inflight[key] = task
+
+            task.add_done_callback(lambda t: self._inflight.pop(key, None))
+
+        # a cancelled caller must not cancel the call shared with the others
+        response = await asyncio.shield(task)
+
+        return response if leader else copy_response(response)
+
+    async def _request(self, method, url, data=None, idempotency_key=None):
+        if self.retry is not None:
+            self.retry.budget.deposit()
+
+        attempt = 0
+
+        while True:
+            try:
+                if self.hedging is not None and method == 'GET':
+                    response = await self._send_hedged(method, url, data, idempotency_key)
+                else:
+                    response = await self._send(method, url, data, idempotency_key)
+
+                result, full_url, headers, body, laps = response
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                delay = self._get_retry_delay(method, attempt, idempotency_key)
+
+                if delay is None:
+                    self._create_connectionerror(e)
+
+                logger.warning(u'RETRY[%s %s] in %2.3f seconds: %s' % (method, url, delay, e))
+            else:
+                delay = self._get_retry_delay(method, attempt, idempotency_key, result)
+
+                if delay is None:
+                    return self._process_result(result, method, full_url, body, headers, laps)
+
+                logger.warning(u'RETRY[%s %s] in %2.3f seconds: status_code %s' % (method, url, delay, result.status_code))
+
+            await asyncio.sleep(delay)
+
+            attempt += 1
+
+    async def aclose(self):
+        self.close()
+
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+        self._inflight = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+
+async def select_get(query, reference, handler=None, resource_model=None, **kwargs):
+    handler = handler or query.handler
+
+    loader = getattr(handler, 'get_loader', lambda: None)()
+
+    # only lookups by primary key can be batched
+    if loader is not None and resource_model is None and not kwargs:
+        return await loader.load(query, reference, handler)
+
+    return await _select_get(query, reference, handler, resource_model, **kwargs)
+
+
+async def _select_get(query, reference, handler, resource_model=None, **kwargs):
+    cache = query.get_cache(handler, resource_model)
+
+    if cache is not None:
+        pairs = cache.get(query.model, reference)
+
+        if pairs is not None:
+            return query.build_instance(pairs, handler)
+
+    url = query.get_url(reference, resource_model, **kwargs)
+
+    query.check_missing(handler, url, reference)
+
+    try:
+        result, data = await handler.request(query.method, url)
+
+        query.check_status(result, data)
+    except APIError as e:
+        raise query.parse_error(e, reference, handler, url)
+
+    pairs = query.parse_result(data)
+
+    if cache is not None:
+        cache.set(query.model, reference, pairs)
+
+    return query.build_instance(pairs, handler)
+
+
+async def select_list(query, reference, resource_model, handler=None):
+    handler = handler or query.handler
+
+    result, data = await handler.request(query.method,
+                                         query.get_list_url(reference, resource_model))
+
+    return [query.build_result(entry, handler) for entry in data]
+
+
+async def insert_execute(query, handler=None, idempotency_key=None):
+    handler = handler or query.handler
+
+    result, data = await handler.request(query.method,
+                                         query.get_url(),
+                                         data=query.parse_insert(),
+                                         idempotency_key=idempotency_key)
+
+    pairs = query.parse_result(data)
+
+    query.invalidate(handler, pairs.get(query.model._meta.pk_name))
+
+    if handler.negative_cache is not None:
+        handler.negative_cache.discard(query.model)
+
+    return dict(pairs, **{'handler': handler})
+
+
+async def update_execute(query, handler=None):
+    handler = handler or query.handler
+
+    result, data = await handler.request(query.method,
+                                         query.get_url(),
+                                         data=query.parse_update())
+
+    query.invalidate(handler, query.reference)
+
+    return query.parse_result(data)
+
+
+async def save(instance, handler=None, cls=None, idempotency_key=None):
+    if handler is None:
+        handler = instance.handler
+
+    if cls is None:
+        cls = instance.__class__
+
+    if instance.get_pk() and not instance.is_dirty():
+        return {}
+
+    query, created = instance.get_save_query()
+
+    pre_save.send(cls, instance=instance)
+
+    if created:
+        result = await query.aexecute(handler, idempotency_key=idempotency_key)
+    else:
+        result = await query.aexecute(handler)
+
+    return instance._post_save(handler, cls, result, created)
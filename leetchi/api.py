@@ -1,26 +1,32 @@
 import requests
 import os
+import threading
 import base64
 import time
 import logging
 import six
 
-from requests.exceptions import ConnectionError
+from contextlib import contextmanager
 
-try:
-    import simplejson as json
-except ImportError:
-    import json
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError, Timeout
 
-from .exceptions import APIError, DecodeError
+from .exceptions import APIError, DecodeError, DeadlineExceeded
+from .deadline import deadline, get_current_deadline
 
-from .utils import openssl_pkey_get_private, openssl_sign, memoize
+from .utils import memoize, submit, SingleFlight, ContextMap, iter_json_array
+from .identity import IdentityMap
+from .cache import copy_value
+
+from .signing import get_signer, ProcessPoolSigner
+from .serializers import get_codec
 
 from .signals import request_finished, request_started, request_error
 
 logger = logging.getLogger('leetchi')
 
-requests_session = requests.Session()
+# the identity map of each handler in the current context
+_identity_maps = ContextMap('leetchi_identity_map')
 
 
 def _get_default_handler():
@@ -31,11 +37,28 @@ def _get_default_handler():
                       private_key_path=leetchi.private_key_path,
                       private_key_password=leetchi.private_key_password,
                       host=leetchi.host,
-                      sandbox=leetchi.sandbox)
+                      sandbox=leetchi.sandbox,
+                      signer=leetchi.signer,
+                      signing_processes=leetchi.signing_processes,
+                      timeout=leetchi.timeout,
+                      codec=leetchi.codec)
 
 get_default_handler = memoize(_get_default_handler, {}, 0)
 
 
+def copy_response(response):
+    """
+    Copy the decoded data of a response shared by coalesced requests,
+    each caller builds its instances from its own mutable values.
+    """
+    result, data = response
+
+    if isinstance(data, (list, dict)):
+        data = copy_value(data)
+
+    return result, data
+
+
 def check_required(required, **kwargs):
     missing_requirements = []
     for requirement in required:
@@ -51,7 +74,12 @@ class LeetchiAPI(object):
     production_host = 'http://api.leetchi.com'
 
     def __init__(self, partner_id, private_key_password, private_key=None,
-                 private_key_path=None, sandbox=False, host=None):
+                 private_key_path=None, sandbox=False, host=None,
+                 signer=None, signing_processes=None, session=None,
+                 pool_connections=10, pool_maxsize=10, pool_block=False,
+                 keep_alive=True, retry=None, timeout=None, hedging=None,
+                 coalesce=False, cache=None, negative_cache=None,
+                 max_workers=None, codec=None):
         self.partner_id = partner_id
 
         if private_key_path is not None:
@@ -71,19 +99,218 @@ class LeetchiAPI(object):
         else:
             self.host = host
 
+        self.signer_backend = signer
+        self.signing_processes = signing_processes
+        self._signer = None
+
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.keep_alive = keep_alive
+
+        self._session = session
+        self._lock = threading.Lock()
+
+        self.retry = retry
+        self.timeout = timeout
+        self.hedging = hedging
+
+        self.coalesce = coalesce
+        self._singleflight = SingleFlight(copy=copy_response)
+
+        self.cache = cache
+        self.negative_cache = negative_cache
+
+        self.max_workers = max_workers
+        self._executor = None
+        self._scheduled = set()
+
+        self.codec = get_codec(codec)
+
+    @property
+    def signer(self):
+        if self._signer is None:
+            with self._lock:
+                if self._signer is None:
+                    self._signer = self.create_signer()
+
+        return self._signer
+
+    def create_signer(self):
+        if self.signing_processes:
+            return ProcessPoolSigner(self.private_key,
+                                     self.private_key_password,
+                                     backend=self.signer_backend,
+                                     max_workers=self.signing_processes)
+
+        return get_signer(self.signer_backend,
+                          self.private_key,
+                          self.private_key_password)
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self.create_session()
+
+        return self._session
+
+    def create_session(self):
+        session = requests.Session()
+
+        adapter = HTTPAdapter(pool_connections=self.pool_connections,
+                              pool_maxsize=self.pool_maxsize,
+                              pool_block=self.pool_block)
+
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+        if not self.keep_alive:
+            session.headers['Connection'] = 'close'
+
+        return session
+
+    @property
+    def executor(self):
+        """
+        A thread pool running the background and concurrent work
+        of the handler, sized like the connection pool by default.
+        """
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    from concurrent.futures import ThreadPoolExecutor
+
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers or self.pool_maxsize)
+
+        return self._executor
+
+    def schedule(self, key, func, *args, **kwargs):
+        """
+        Run ``func`` in background unless a task with the same key
+        is already pending, errors are logged.
+        """
+        with self._lock:
+            if key in self._scheduled:
+                return None
+
+            self._scheduled.add(key)
+
+        def run():
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                logger.exception(u'Background task %s failed' % (key, ))
+            finally:
+                with self._lock:
+                    self._scheduled.discard(key)
+
+        return self.executor.submit(run)
+
+    def get_pool_stats(self):
+        """
+        Return the number of requests which reused a pooled connection (hits)
+        and the number of connections opened (misses) by the live pools.
+        """
+        stats = {'hits': 0, 'misses': 0}
+
+        if self._session is None:
+            return stats
+
+        adapters = set(self._session.adapters.values())
+
+        for adapter in adapters:
+            pools = getattr(adapter, 'poolmanager', None)
+
+            if pools is None:
+                continue
+
+            pools = pools.pools
+
+            for key in pools.keys():
+                pool = pools[key]
+
+                stats['misses'] += pool.num_connections
+                stats['hits'] += max(pool.num_requests - pool.num_connections, 0)
+
+        return stats
+
+    def deadline(self, timeout):
+        return deadline(timeout)
+
+    @contextmanager
+    def identity_map(self):
+        """
+        Hydrate each primary key to a single instance in the block,
+        nested blocks share the map of the outermost one.
+        """
+        current = _identity_maps.get(self)
+
+        if current is not None:
+            yield current
+            return
+
+        token = _identity_maps.set(self, IdentityMap())
+
+        try:
+            yield _identity_maps.get(self)
+        finally:
+            _identity_maps.reset(token)
+
+    def get_identity_map(self):
+        return _identity_maps.get(self)
+
+    def get_timeout(self):
+        """
+        Return the (connect, read) timeout of the next request bounded
+        by the current deadline.
+        """
+        timeout = self.timeout
+
+        current = get_current_deadline()
+
+        if current is None:
+            return timeout
+
+        remaining = current.remaining()
+
+        if remaining <= 0:
+            raise DeadlineExceeded('Deadline of %s seconds exceeded' % current.timeout)
+
+        if timeout is None:
+            return (remaining, remaining)
+
+        if not isinstance(timeout, tuple):
+            timeout = (timeout, timeout)
+
+        return tuple(min(t, remaining) if t is not None else remaining
+                     for t in timeout)
+
+    def close(self):
+        if self._signer is not None and hasattr(self._signer, 'shutdown'):
+            self._signer.shutdown()
+            self._signer = None
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
     def _auth_signature(self, method, url_path, body, timestamp=None):
         if not timestamp:
             timestamp = time.time()
 
-        url_path += '?ts=%d' % int(timestamp)
+        url_path = self._add_timestamp(url_path, timestamp)
 
         data = self._format_data(method, url_path, body)
 
-        private_key = openssl_pkey_get_private(self.private_key, self.private_key_password)
-
-        signed_data = openssl_sign(data, private_key)
+        signed_data = self.signer.sign(data)
 
-        signature = getattr(base64, 'encodestring', 'encodebytes')(signed_data)
+        signature = getattr(base64, 'encodebytes', getattr(base64, 'encodestring', None))(signed_data)
 
         return signature
 
@@ -91,7 +318,11 @@ class LeetchiAPI(object):
         data = '%s|%s|' % (method, self._generate_api_url(url_path))
 
         if method != 'GET':
-            data += '%s|' % json.dumps(body)
+            # the body is signed as it is sent when it is already serialized
+            if not isinstance(body, six.binary_type):
+                body = self.codec.dumps(body)
+
+            data += '%s|' % body.decode('utf-8')
 
         return data
 
@@ -99,16 +330,21 @@ class LeetchiAPI(object):
         if not timestamp:
             timestamp = int(time.time())
 
-        return '%s%s' % (self.host, self._generate_api_url(url)) + '?ts=%d' % timestamp
+        return self._add_timestamp('%s%s' % (self.host, self._generate_api_url(url)), timestamp)
+
+    def _add_timestamp(self, url, timestamp):
+        return '%s%sts=%d' % (url, '&' if '?' in url else '?', int(timestamp))
 
     def _generate_api_url(self, request_uri):
         return '/v1/partner/%s%s' % (self.partner_id, request_uri)
 
-    def request(self, method, url, data=None):
-
+    def _prepare_request(self, method, url, data=None, idempotency_key=None):
         timestamp = time.time()
 
-        signature = self._auth_signature(method, url, data, timestamp)
+        # serialize the body once, the same bytes are signed and sent
+        body = self.codec.dumps(data) if method != 'GET' else None
+
+        signature = self._auth_signature(method, url, body, timestamp)
 
         if six.PY3:
             signature = signature.decode('utf-8')
@@ -118,26 +354,186 @@ class LeetchiAPI(object):
             'Content-Type': 'application/json'
         }
 
-        if data:
-            data = json.dumps(data)
+        if idempotency_key:
+            headers['Idempotency-Key'] = idempotency_key
 
         url = self._generate_host(url, timestamp)
 
+        return url, headers, body if data else None
+
+    def _send(self, method, url, data=None, idempotency_key=None, stream=False):
+        url, headers, data = self._prepare_request(method, url, data, idempotency_key)
+
+        timeout = self.get_timeout()
+
         logger.info(u'DATA[IN -> %s]\n\t- headers: %s\n\t- content: %s' % (url, headers, data))
 
         ts = time.time()
 
         request_started.send(url=url, data=data, headers=headers, method=method)
 
-        try:
-            result = requests_session.request(method, url,
-                                              headers=headers,
-                                              data=data)
-        except ConnectionError as e:
-            raise APIError(e.message)
+        result = self.session.request(method, url,
+                                      headers=headers,
+                                      data=data,
+                                      timeout=timeout,
+                                      stream=stream)
 
         laps = time.time() - ts
 
+        return result, url, headers, data, laps
+
+    def _send_hedged(self, method, url, data=None, idempotency_key=None):
+        from concurrent.futures import wait, FIRST_COMPLETED
+
+        delay = self.hedging.get_delay()
+
+        if delay is None:
+            response = self._send(method, url, data, idempotency_key)
+        else:
+            futures = [submit(self.hedging.executor, self._send, method, url, data, idempotency_key)]
+
+            done, pending = wait(futures, timeout=delay)
+
+            if not done:
+                logger.info(u'HEDGE[%s %s] after %2.3f seconds' % (method, url, delay))
+
+                futures.append(submit(self.hedging.executor, self._send, method, url, data, idempotency_key))
+
+                done, pending = wait(futures, return_when=FIRST_COMPLETED)
+
+                winner = done.pop()
+
+                # fall back on the other attempt when the first one to finish failed
+                if winner.exception() is not None and pending:
+                    winner = pending.pop()
+
+                # the loser response is discarded, it is only cancelled if it did not start yet
+                for future in futures:
+                    if future is not winner:
+                        future.cancel()
+            else:
+                winner = done.pop()
+
+            response = winner.result()
+
+        self.hedging.add(response[-1])
+
+        return response
+
+    def _get_retry_delay(self, method, attempt, idempotency_key=None, result=None):
+        if self.retry is None:
+            return None
+
+        retry_after = None
+
+        if result is not None:
+            if result.status_code not in self.retry.statuses:
+                return None
+
+            retry_after = result.headers.get('Retry-After')
+
+        current = get_current_deadline()
+
+        return self.retry.get_retry_delay(method, attempt, idempotency_key, retry_after,
+                                          remaining=current.remaining() if current is not None else None)
+
+    def _create_connectionerror(self, error):
+        current = get_current_deadline()
+
+        if current is not None and current.expired():
+            raise DeadlineExceeded('Deadline of %s seconds exceeded: %s' % (current.timeout, error))
+
+        raise APIError(six.text_type(error))
+
+    def request(self, method, url, data=None, idempotency_key=None):
+        if self.coalesce and method == 'GET':
+            return self._singleflight.do((method, url), self._request,
+                                         method, url, data, idempotency_key)
+
+        return self._request(method, url, data, idempotency_key)
+
+    def _request(self, method, url, data=None, idempotency_key=None):
+        if self.retry is not None:
+            self.retry.budget.deposit()
+
+        attempt = 0
+
+        while True:
+            try:
+                if self.hedging is not None and method == 'GET':
+                    response = self._send_hedged(method, url, data, idempotency_key)
+                else:
+                    response = self._send(method, url, data, idempotency_key)
+
+                result, full_url, headers, body, laps = response
+            except (ConnectionError, Timeout) as e:
+                delay = self._get_retry_delay(method, attempt, idempotency_key)
+
+                if delay is None:
+                    self._create_connectionerror(e)
+
+                logger.warning(u'RETRY[%s %s] in %2.3f seconds: %s' % (method, url, delay, e))
+            else:
+                delay = self._get_retry_delay(method, attempt, idempotency_key, result)
+
+                if delay is None:
+                    return self._process_result(result, method, full_url, body, headers, laps)
+
+                logger.warning(u'RETRY[%s %s] in %2.3f seconds: status_code %s' % (method, url, delay, result.status_code))
+
+            time.sleep(delay)
+
+            attempt += 1
+
+    def stream(self, method, url, data=None, chunk_size=8192):
+        """
+        Send the request and yield the elements of the JSON array returned
+        as soon as they are decoded, the body is read by chunks of
+        ``chunk_size`` bytes instead of being buffered.
+
+        ``request_finished`` receivers must not read the content of the result.
+        """
+        try:
+            result, full_url, headers, body, laps = self._send(method, url, data, stream=True)
+        except (ConnectionError, Timeout) as e:
+            self._create_connectionerror(e)
+
+        try:
+            request_finished.send(url=full_url,
+                                  data=body,
+                                  headers=headers,
+                                  method=method,
+                                  result=result,
+                                  laps=laps)
+
+            logger.info(u'DATA[OUT -> %s][%2.3f seconds]\n\t- status_code: %s\n\t- headers: %s\n\t- content: <streamed>' % (
+                full_url,
+                laps,
+                result.status_code,
+                result.headers)
+            )
+
+            if result.status_code not in (requests.codes.ok, requests.codes.created, requests.codes.accepted):
+                self._create_apierror(result, url=full_url, data=body, method=method)
+
+            try:
+                for entry in iter_json_array(result.iter_content(chunk_size), self.codec.get_raw_decoder()):
+                    yield entry
+            except ValueError as e:
+                logger.error(u'DECODE ERROR: status_code: %s | headers: %s | error: %s' % (result.status_code,
+                                                                                           result.headers,
+                                                                                           e))
+
+                request_error.send(url=full_url, status_code=result.status_code, headers=result.headers)
+
+                raise DecodeError(six.text_type(e),
+                                  code=result.status_code,
+                                  headers=result.headers,
+                                  url=full_url)
+        finally:
+            result.close()
+
+    def _process_result(self, result, method, url, data, headers, laps):
         request_finished.send(url=url,
                               data=data,
                               headers=headers,
@@ -159,7 +555,7 @@ class LeetchiAPI(object):
         else:
             if result.content:
                 try:
-                    return result, json.loads(result.content)
+                    return result, self.codec.loads(result.content)
                 except ValueError:
                     self._create_decodeerror(result, url=url)
             else:
@@ -184,7 +580,7 @@ class LeetchiAPI(object):
         request_error.send(url=url, status_code=status_code, headers=headers)
 
         try:
-            content = result.json()
+            content = self.codec.loads(result.content)
         except ValueError:
             content = None
 
@@ -205,7 +601,7 @@ class LeetchiAPI(object):
         request_error.send(url=url, status_code=status_code, headers=headers)
 
         try:
-            content = result.json()
+            content = self.codec.loads(result.content)
         except ValueError:
             content = None
 
@@ -1,8 +1,10 @@
+import re
 import six
 
 from copy import deepcopy
 
-from .fields import PrimaryKeyField, FieldDescriptor, Field
+from .fields import PrimaryKeyField, FieldDescriptor, Field, ManyToManyField
+from .records import create_record_class, create_projected_record_class, get_id_array_converter
 from .query import UpdateQuery, InsertQuery, SelectQuery
 from .signals import pre_save, post_save
 from .utils import force_text, force_str
@@ -59,6 +61,174 @@ class BaseModelOptions(object):
 
             self.defaults[field] = field.default
 
+        self.required_fields = set(field.name for field in self.fields.values() if field.required)
+
+        # the fields formatted in the url of the model, always retrieved
+        url = getattr(self, 'url', None)
+        urls = url.values() if isinstance(url, dict) else [url]
+
+        self.url_fields = frozenset(name for url in urls if url
+                                    for name in re.findall(r'%\((\w+)\)', url))
+
+        self.converters = dict((field.name, (field.api_name, field.get_python_converter()))
+                               for field in self.fields.values())
+
+        self.decoder = self.compile_decoder()
+        self.decoders = {}
+
+        self._record_class = None
+        self.record_decoders = {}
+        self.encoder = self.compile_encoder()
+
+    def resolve_fields(self, names):
+        """
+        Return the field names of ``names`` which can be fields or foreign keys.
+        """
+        fields = set()
+
+        for name in names:
+            name = self.rel_fields.get(name, name)
+
+            self.get_field_by_name(name)
+
+            fields.add(name)
+
+        return frozenset(fields)
+
+    def get_decoder(self, names=None):
+        """
+        Return the decoder of the fields ``names``, compiled once for each projection.
+        """
+        if names is None:
+            return self.decoder
+
+        decoder = self.decoders.get(names)
+
+        if decoder is None:
+            decoder = self.decoders[names] = self.compile_decoder(names)
+
+        return decoder
+
+    def compile_decoder(self, names=None):
+        """
+        Build the function which converts an API result to field values
+        in a single pass over the fields (or the fields ``names``).
+        """
+        converters = [(api_name, name, convert)
+                      for name, (api_name, convert) in self.converters.items()
+                      if names is None or name in names]
+
+        def decode(result):
+            pairs = {}
+
+            if not result:
+                return pairs
+
+            for api_name, name, convert in converters:
+                if api_name in result:
+                    value = result[api_name]
+
+                    pairs[name] = value if convert is None else convert(value)
+
+            return pairs
+
+        return decode
+
+    def get_record_class(self):
+        if self._record_class is None:
+            self._record_class = create_record_class(self.model_class)
+
+        return self._record_class
+
+    def get_record_decoder(self, names=None):
+        """
+        Return the function which builds a record from an API result,
+        compiled once for each projection.
+        """
+        decoder = self.record_decoders.get(names)
+
+        if decoder is None:
+            decoder = self.record_decoders[names] = self.compile_record_decoder(names)
+
+        return decoder
+
+    def compile_record_decoder(self, names=None):
+        record_class = self.get_record_class()
+
+        if names is not None:
+            record_class = create_projected_record_class(record_class, names)
+
+        defaults = dict((field.name, default) for field, default in self.defaults.items())
+
+        converters = []
+
+        for name, (api_name, convert) in self.converters.items():
+            if names is not None and name not in names:
+                continue
+
+            if isinstance(self.fields[name], ManyToManyField):
+                convert = get_id_array_converter(convert)
+
+            converters.append((api_name, name, convert))
+
+        skipped = [name for name in record_class.field_names
+                   if name not in set(name for api_name, name, convert in converters)]
+
+        new = object.__new__
+
+        # records are read-only, bypass their __setattr__
+        set_slot = object.__setattr__
+
+        def decode(result, handler=None):
+            record = new(record_class)
+            set_slot(record, 'handler', handler)
+
+            for api_name, name, convert in converters:
+                if api_name in result:
+                    value = result[api_name]
+
+                    set_slot(record, name, value if convert is None else convert(value))
+                else:
+                    default = defaults.get(name)
+
+                    set_slot(record, name, default() if callable(default) else default)
+
+            for name in skipped:
+                set_slot(record, name, None)
+
+            return record
+
+        return decode
+
+    def compile_encoder(self):
+        """
+        Build the function which converts field values to an API payload,
+        required fields are always sent, the others when they are not None.
+        """
+        converters = dict((field.name, (field.api_name, field.required, field.get_api_converter()))
+                          for field in self.fields.values())
+
+        def encode(values):
+            payload = {}
+
+            for name, value in six.iteritems(values):
+                try:
+                    api_name, required, convert = converters[name]
+                except KeyError:
+                    raise AttributeError('Field named %s not found' % name)
+
+                if required or value is not None:
+                    payload[api_name] = value if convert is None else convert(value)
+
+            return payload
+
+        return encode
+
+    def encode_many(self, values_list):
+        encode = self.encoder
+
+        return [encode(values) for values in values_list]
+
     def get_default_dict(self):
         dd = {}
         for field, default in self.defaults.items():
@@ -106,6 +276,10 @@ class ApiObjectBase(type):
                 if not isinstance(attr, FieldDescriptor) or attr in attrs:
                     continue
 
+                # relations are not inherited, their ids are stored under another name
+                if getattr(attr.field, 'descriptor', k) != k:
+                    continue
+
                 attrs[k] = deepcopy(attr.field)
 
                 if isinstance(attr.field, PrimaryKeyField) and not orig_primary_key:
@@ -117,6 +291,9 @@ class ApiObjectBase(type):
         cls._meta = _meta
         cls._data = None
 
+        # replaced by a set on the first change
+        cls._dirty_fields = frozenset()
+
         for name, attr in list(cls.__dict__.items()):
             if not isinstance(attr, Field):
                 continue
@@ -147,6 +324,10 @@ class BaseApiModel(object):
         self._data = self._meta.get_default_dict()
         self.handler = None
 
+        # always set so every instance shares the same attribute layout
+        self._raw = None
+        self._loaded_fields = None
+
         for k, v in kwargs.items():
             setattr(self, k, v)
 
@@ -168,38 +349,156 @@ class BaseApiModel(object):
                 self.get_pk() and
                 other.get_pk() == self.get_pk())
 
-    def save(self, handler=None, cls=None):
-        if handler is None:
-            handler = self.handler or get_default_handler()
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        pk = self.get_pk()
+
+        # the hash of an instance must not change once saved
+        if pk is None:
+            raise TypeError('%s instances without primary key are unhashable' % self.__class__.__name__)
+
+        return hash((self.__class__, pk))
 
+    def get_save_fields(self):
         field_dict = dict(self._data)
         field_dict.update(self.get_field_dict())
         field_dict.pop(self._meta.pk_name)
 
+        return field_dict
+
+    @classmethod
+    def from_api(cls, result, handler=None):
+        """
+        Build an instance which keeps the API ``result`` and decodes
+        each field the first time it is read.
+        """
+        instance = cls(handler=handler)
+        instance._raw = result or {}
+
+        # the values of the result take precedence over the defaults
+        for field in cls._meta.defaults:
+            if field.api_name in instance._raw:
+                instance._data.pop(field.name, None)
+
+        return instance
+
+    def _decode_field(self, name):
+        api_name, convert = self._meta.converters[name]
+
+        if api_name not in self._raw:
+            return None
+
+        value = self._raw[api_name]
+
+        if convert is not None:
+            value = convert(value)
+
+        self._data[name] = value
+
+        return value
+
+    def get_dirty_fields(self):
+        return set(self._dirty_fields)
+
+    def is_dirty(self):
+        return bool(self._dirty_fields)
+
+    def mark_clean(self, names=None):
+        """
+        Forget the changes of the fields ``names`` (all by default),
+        they will not be sent by the next update.
+        """
+        if not self._dirty_fields:
+            return
+
+        if names is None:
+            self._dirty_fields.clear()
+        else:
+            self._dirty_fields.difference_update(names)
+
+    def get_loaded_fields(self):
+        """
+        Return the names of the fields retrieved from the API,
+        None when all of them were.
+        """
+        return self._loaded_fields
+
+    def mark_loaded(self, names=None, reset=False):
+        """
+        Record that the fields ``names`` (all by default) were retrieved,
+        in addition to the previous ones unless ``reset`` is True.
+        """
+        if names is None:
+            self._loaded_fields = None
+        elif reset:
+            self._loaded_fields = frozenset(names)
+        elif self._loaded_fields is not None:
+            self._loaded_fields = self._loaded_fields | frozenset(names)
+
+    def get_save_query(self):
+        field_dict = self.get_save_fields()
+
+        if self.get_pk():
+            loaded = self._loaded_fields
+
+            # only the changed fields are updated with the required ones which were retrieved
+            updated = dict((k, v) for k, v in field_dict.items()
+                           if k in self._dirty_fields or
+                           (k in self._meta.required_fields and (loaded is None or k in loaded)))
+
+            query = self.update(self.get_pk(), **updated)
+
+            # the url is formatted from all the values, not only the ones sent
+            query.url_params = field_dict
+
+            return query, False
+
+        return self.insert(**field_dict), True
+
+    def save(self, handler=None, cls=None, idempotency_key=None):
+        if handler is None:
+            handler = self.handler or get_default_handler()
+
         if cls is None:
             cls = self.__class__
 
-        created = False
+        if self.get_pk() and not self.is_dirty():
+            return {}
+
+        query, created = self.get_save_query()
 
         pre_save.send(cls, instance=self)
 
-        if self.get_pk():
-            update = self.update(
-                self.get_pk(),
-                **field_dict
-            )
-            result = update.execute(handler)
+        if created:
+            result = query.execute(handler, idempotency_key=idempotency_key)
         else:
-            insert = self.insert(**field_dict)
-            result = insert.execute(handler)
+            result = query.execute(handler)
 
-            created = True
+        return self._post_save(handler, cls, result, created)
 
+    def asave(self, handler=None, cls=None, idempotency_key=None):
+        from .aio import save
+
+        return save(self, handler, cls, idempotency_key)
+
+    def _post_save(self, handler, cls, result, created):
         post_save.send(cls, instance=self, created=created)
 
         for key, value in result.items():
             setattr(self, key, value)
 
+        self.mark_clean()
+
+        if handler.cache is not None and self.get_pk() and self._loaded_fields is None:
+            handler.cache.set(self.__class__, self.get_pk(), self.get_field_dict())
+
+        identity_map = handler.get_identity_map()
+
+        if identity_map is not None:
+            identity_map.add(self)
+
         return result
 
     @classmethod
@@ -211,8 +510,9 @@ class BaseApiModel(object):
     @classmethod
     def create(cls, **query):
         handler = query.pop('handler')
+        idempotency_key = query.pop('idempotency_key', None)
         inst = cls(**query)
-        inst.save(handler)
+        inst.save(handler, idempotency_key=idempotency_key)
         return inst
 
     @classmethod
@@ -227,6 +527,13 @@ class BaseApiModel(object):
 
         return InsertQuery(cls, **query)
 
+    @classmethod
+    def encode_many(cls, instances):
+        """
+        Return the API payloads of ``instances`` for batch writes.
+        """
+        return cls._meta.encode_many([instance.get_save_fields() for instance in instances])
+
     @classmethod
     def get(cls, *args, **kwargs):
         return cls.select().get(*args, **kwargs)
@@ -241,6 +548,11 @@ class BaseApiModel(object):
                                             self.__class__,
                                             handler=self.handler)
 
+    def iterator(self, resource_model):
+        return resource_model.select().iterator(self.get_pk(),
+                                                self.__class__,
+                                                handler=self.handler)
+
     def get_pk(self):
         return getattr(self, self._meta.pk_name, None)
 
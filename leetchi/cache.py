@@ -0,0 +1,248 @@
+import copy
+import threading
+import time
+
+
+def copy_value(value):
+    """
+    Copy a decoded dict (or a list of them) and its mutable values
+    (the lists of ids), scalars are shared.
+    """
+    if isinstance(value, list):
+        return [copy_value(item) if isinstance(item, (list, dict)) else item for item in value]
+
+    return dict((key, copy.deepcopy(item) if isinstance(item, (list, dict, set)) else item)
+                for key, item in value.items())
+
+
+class LinkedDict(object):
+    """
+    The part of ``collections.OrderedDict`` used by the caches, which is
+    missing on Python 2.6: keys are kept in insertion order in a circular
+    doubly linked list of ``[prev, next, key, value]`` links.
+    """
+
+    def __init__(self):
+        self._map = {}
+        self._root = root = []
+        root[:] = [root, root, None, None]
+
+    def get(self, key, default=None):
+        link = self._map.get(key)
+
+        return default if link is None else link[3]
+
+    def __setitem__(self, key, value):
+        link = self._map.get(key)
+
+        # like OrderedDict, an existing key keeps its position
+        if link is not None:
+            link[3] = value
+            return
+
+        root = self._root
+        last = root[0]
+
+        last[1] = root[0] = self._map[key] = [last, root, key, value]
+
+    def pop(self, key, default=None):
+        link = self._map.pop(key, None)
+
+        if link is None:
+            return default
+
+        prev, next = link[0], link[1]
+        prev[1] = next
+        next[0] = prev
+
+        return link[3]
+
+    def __delitem__(self, key):
+        if key not in self._map:
+            raise KeyError(key)
+
+        self.pop(key)
+
+    def popitem(self, last=True):
+        if not self._map:
+            raise KeyError('dictionary is empty')
+
+        link = self._root[0] if last else self._root[1]
+
+        self.pop(link[2])
+
+        return link[2], link[3]
+
+    def clear(self):
+        self._map.clear()
+        self._root[:] = [self._root, self._root, None, None]
+
+    def __contains__(self, key):
+        return key in self._map
+
+    def __iter__(self):
+        root = self._root
+        link = root[1]
+
+        while link is not root:
+            yield link[2]
+
+            link = link[1]
+
+    def __len__(self):
+        return len(self._map)
+
+
+class LRUCache(object):
+    """
+    A thread safe LRU cache of parsed resources keyed by model and
+    primary key.
+
+    Entries expire after ``ttl`` seconds, ``ttls`` maps models
+    to their own ttl.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60, ttls=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.ttls = ttls or {}
+
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = LinkedDict()
+        self._lock = threading.Lock()
+
+    def get_ttl(self, model):
+        return self.ttls.get(model, self.ttl)
+
+    def get(self, model, pk):
+        key = (model, pk)
+
+        with self._lock:
+            entry = self._entries.pop(key, None)
+
+            if entry is None or time.time() - entry[1] > self.get_ttl(model):
+                self.misses += 1
+
+                return None
+
+            self._entries[key] = entry
+
+            self.hits += 1
+
+        return copy_value(entry[0])
+
+    def get_entry(self, model, pk):
+        """
+        Return the value and the age in seconds of an entry,
+        even when it expired.
+        """
+        key = (model, pk)
+
+        with self._lock:
+            entry = self._entries.pop(key, None)
+
+            if entry is None:
+                self.misses += 1
+
+                return None
+
+            self._entries[key] = entry
+
+            self.hits += 1
+
+        return copy_value(entry[0]), time.time() - entry[1]
+
+    def set(self, model, pk, value):
+        key = (model, pk)
+
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (copy_value(value), time.time())
+
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, model, pk):
+        with self._lock:
+            self._entries.pop((model, pk), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._entries),
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class NegativeCache(object):
+    """
+    Remember for ``ttl`` seconds the lookups which raised ``DoesNotExist``,
+    keyed by model and url.
+    """
+
+    def __init__(self, maxsize=1024, ttl=5):
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = LinkedDict()
+        self._lock = threading.Lock()
+
+    def add(self, model, key):
+        with self._lock:
+            self._entries.pop((model, key), None)
+            self._entries[(model, key)] = time.time() + self.ttl
+
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def contains(self, model, key):
+        with self._lock:
+            expires_at = self._entries.get((model, key))
+
+            if expires_at is None or expires_at < time.time():
+                self._entries.pop((model, key), None)
+
+                self.misses += 1
+
+                return False
+
+            self.hits += 1
+
+            return True
+
+    def discard(self, model, key=None):
+        """
+        Forget ``key`` or every entry of ``model`` when ``key`` is None.
+        """
+        with self._lock:
+            if key is not None:
+                self._entries.pop((model, key), None)
+            else:
+                for entry in [entry for entry in self._entries if entry[0] is model]:
+                    del self._entries[entry]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._entries),
+        }
+
+    def __len__(self):
+        return len(self._entries)
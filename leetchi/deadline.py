@@ -0,0 +1,48 @@
+import time
+
+from contextlib import contextmanager
+
+from .utils import ContextLocal
+
+
+class Deadline(object):
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.expires_at = time.time() + timeout
+
+    def remaining(self):
+        return self.expires_at - time.time()
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def __repr__(self):
+        return '<Deadline: %2.3f seconds remaining>' % self.remaining()
+
+
+_current_deadline = ContextLocal('leetchi_deadline')
+
+
+def get_current_deadline():
+    return _current_deadline.get()
+
+
+@contextmanager
+def deadline(timeout):
+    """
+    Bound every request sent in the block to ``timeout`` seconds overall,
+    a nested deadline cannot extend the one of its parent.
+    """
+    current = get_current_deadline()
+
+    new = Deadline(timeout)
+
+    if current is not None and current.expires_at < new.expires_at:
+        new = current
+
+    token = _current_deadline.set(new)
+
+    try:
+        yield new
+    finally:
+        _current_deadline.reset(token)
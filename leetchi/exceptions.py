@@ -15,3 +15,7 @@ class DecodeError(APIError):
         self.content = kwargs.pop('content', None)
 
         super(DecodeError, self).__init__(*args, **kwargs)
+
+
+class DeadlineExceeded(APIError):
+    pass
@@ -13,6 +13,9 @@ class FieldDescriptor(object):
 
     def __get__(self, instance, instance_type=None):
         if instance is not None:
+            if instance._raw is not None and self.att_name not in instance._data:
+                return instance._decode_field(self.att_name)
+
             return instance._data.get(self.att_name)
 
         return self.field
@@ -20,6 +23,11 @@ class FieldDescriptor(object):
     def __set__(self, instance, value):
         instance._data[self.att_name] = value
 
+        if instance._dirty_fields:
+            instance._dirty_fields.add(self.att_name)
+        else:
+            instance._dirty_fields = set([self.att_name])
+
 
 class Field(object):
     default = None
@@ -72,6 +80,30 @@ class Field(object):
             value = self.python_value_callback(value)
         return value
 
+    def overrides(self, klass, name):
+        return (six.get_unbound_function(getattr(self.__class__, name)) is not
+                six.get_unbound_function(getattr(klass, name)))
+
+    def get_python_converter(self):
+        """
+        Return a callable equivalent to ``python_value`` without the
+        ``super()`` chain or None when values are kept as they are.
+        """
+        if self.overrides(Field, 'python_value'):
+            return self.python_value
+
+        return self.python_value_callback
+
+    def get_api_converter(self):
+        """
+        Return a callable equivalent to ``api_value`` without the
+        ``super()`` chain or None when values are sent as they are.
+        """
+        if self.overrides(Field, 'api_value'):
+            return self.api_value
+
+        return self.api_value_callback
+
 
 class CharField(Field):
     pass
@@ -83,7 +115,7 @@ class DateTimeField(Field):
 
         if isinstance(value, six.string_types):
             value = value.rsplit('.', 1)[0]
-            value = datetime(*time.strptime(value, '%Y-%m-%d %H:%M:%S')[:6])
+            value = datetime.datetime(*time.strptime(value, '%Y-%m-%d %H:%M:%S')[:6])
 
         if isinstance(value, six.integer_types):
             value = datetime.datetime.utcfromtimestamp(value)
@@ -121,6 +153,13 @@ class DateField(Field):
         return value
 
 
+def get_number_converter(callback, cast):
+    if callback is None:
+        return lambda value: cast(value) if value is not None else None
+
+    return lambda value: cast(callback(value)) if value is not None else None
+
+
 class IntegerField(Field):
     def api_value(self, value):
         return self.null_wrapper(super(IntegerField, self).api_value(value), 0)
@@ -129,6 +168,19 @@ class IntegerField(Field):
         if value is not None:
             return int(super(IntegerField, self).python_value(value))
 
+    def get_python_converter(self):
+        if self.overrides(IntegerField, 'python_value'):
+            return self.python_value
+
+        return get_number_converter(self.python_value_callback, int)
+
+    def get_api_converter(self):
+        if self.overrides(IntegerField, 'api_value'):
+            return self.api_value
+
+        # null_wrapper returns the value as it is with a falsy default
+        return self.api_value_callback
+
 
 class FloatField(Field):
     def api_value(self, value):
@@ -138,6 +190,18 @@ class FloatField(Field):
         if value is not None:
             return float(super(FloatField, self).python_value(value))
 
+    def get_python_converter(self):
+        if self.overrides(FloatField, 'python_value'):
+            return self.python_value
+
+        return get_number_converter(self.python_value_callback, float)
+
+    def get_api_converter(self):
+        if self.overrides(FloatField, 'api_value'):
+            return self.api_value
+
+        return self.api_value_callback
+
 
 class PrimaryKeyField(IntegerField):
     pass
@@ -160,6 +224,25 @@ class BooleanField(IntegerField):
 
         return bool(value)
 
+    def get_python_converter(self):
+        if self.overrides(BooleanField, 'python_value'):
+            return self.python_value
+
+        convert = get_number_converter(self.python_value_callback, int)
+
+        return lambda value: value is not None and bool(convert(value))
+
+    def get_api_converter(self):
+        if self.overrides(BooleanField, 'api_value'):
+            return self.api_value
+
+        callback = self.api_value_callback
+
+        if callback is None:
+            return lambda value: 1 if value else 0
+
+        return lambda value: 1 if callback(value) else 0
+
 
 class EmailField(CharField):
     pass
@@ -218,7 +301,7 @@ class ForeignKeyField(IntegerField):
 
         klass._meta.rel_fields[name] = self.name
         setattr(klass, self.descriptor, ForeignRelatedObject(self.to, self.name))
-        setattr(klass, self.name, None)
+        setattr(klass, self.name, FieldDescriptor(self))
 
         reverse_rel = ReverseForeignRelatedObject(klass, self.name)
         setattr(self.to, self.related_name, reverse_rel)
@@ -233,6 +316,25 @@ class ForeignKeyField(IntegerField):
 
         return value
 
+    def get_api_converter(self):
+        from .base import BaseApiModel
+
+        if self.overrides(ForeignKeyField, 'api_value'):
+            return self.api_value
+
+        callback = self.api_value_callback
+
+        def convert(value):
+            if callback is not None:
+                value = callback(value)
+
+            if isinstance(value, BaseApiModel):
+                value = value.get_pk()
+
+            return value
+
+        return convert
+
 
 class OneToOneField(ForeignKeyField):
     def add_to_class(self, klass, name):
@@ -247,7 +349,7 @@ class OneToOneField(ForeignKeyField):
 
         klass._meta.rel_fields[name] = self.name
         setattr(klass, self.descriptor, ForeignRelatedObject(self.to, self.name))
-        setattr(klass, self.name, None)
+        setattr(klass, self.name, FieldDescriptor(self))
 
         reverse_rel = ReverseOneToOneRelatedObject(klass, self.name)
         setattr(self.to, self.related_name, reverse_rel)
@@ -261,6 +363,9 @@ class ForeignRelatedObject(object):
         self.cache_name = '_cache_%s' % name
 
     def __get__(self, instance, instance_type=None):
+        if instance is None:
+            return self
+
         if not getattr(instance, self.cache_name, None):
             id = getattr(instance, self.field_name, 0)
             related = self.to.select().get(id, handler=instance.handler)
@@ -279,7 +384,10 @@ class ReverseForeignRelatedObject(object):
         self.related_model = related_model
 
     def __get__(self, instance, instance_type=None):
-        return instance.list(self.related_model)
+        if instance is None:
+            return self
+
+        return instance.iterator(self.related_model)
 
 
 class ManyToManyField(ListField):
@@ -301,7 +409,7 @@ class ManyToManyField(ListField):
 
         klass._meta.rel_fields[name] = self.name
         setattr(klass, self.descriptor, ManyToManyRelatedObject(self.to, self.name))
-        setattr(klass, self.name, None)
+        setattr(klass, self.name, FieldDescriptor(self))
 
         reverse_rel = ManyToManyRelatedObject(klass, self.name)
 
@@ -313,12 +421,31 @@ class ManyToManyField(ListField):
         values = super(ManyToManyField, self).api_value(value)
 
         for i in range(len(values)):
-            if isinstance(value, BaseApiModel):
-                value = value.get_pk()
-                values[i] = value
+            if isinstance(values[i], BaseApiModel):
+                values[i] = values[i].get_pk()
 
         return values
 
+    def get_api_converter(self):
+        from .base import BaseApiModel
+
+        if self.overrides(ManyToManyField, 'api_value'):
+            return self.api_value
+
+        callback = self.api_value_callback
+
+        def convert(values):
+            if callback is not None:
+                values = callback(values)
+
+            if values is None:
+                return values
+
+            return [value.get_pk() if isinstance(value, BaseApiModel) else value
+                    for value in values]
+
+        return convert
+
 
 class ManyToManyRelatedObject(object):
     def __init__(self, related_model, name):
@@ -326,7 +453,10 @@ class ManyToManyRelatedObject(object):
         self.field_name = name
 
     def __get__(self, instance, instance_type=None):
-        return instance.list(self.related_model)
+        if instance is None:
+            return self
+
+        return instance.iterator(self.related_model)
 
     def __set__(self, instance, objs):
         setattr(instance, self.field_name, [obj.get_pk() for obj in objs])
@@ -0,0 +1,78 @@
+import collections
+import threading
+
+
+class LatencyTracker(object):
+    """
+    Keep the latencies of the last ``size`` requests.
+    """
+
+    def __init__(self, size=100):
+        self.samples = collections.deque(maxlen=size)
+
+        self._lock = threading.Lock()
+
+    def add(self, laps):
+        with self._lock:
+            self.samples.append(laps)
+
+    def percentile(self, percentile):
+        with self._lock:
+            samples = sorted(self.samples)
+
+        if not samples:
+            return None
+
+        index = int(round(percentile / 100.0 * (len(samples) - 1)))
+
+        return samples[index]
+
+    def __len__(self):
+        return len(self.samples)
+
+
+class HedgingPolicy(object):
+    """
+    Send a second identical GET when the first one has not answered
+    after the ``percentile`` of the recent latencies, the first response wins.
+
+    Hedging starts once ``min_samples`` latencies have been recorded.
+    Attempts run in a dedicated thread pool of ``max_workers`` threads.
+    """
+
+    def __init__(self, percentile=95, min_samples=20, min_delay=0.01, window=100,
+                 max_workers=10):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.max_workers = max_workers
+        self.tracker = LatencyTracker(window)
+
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    from concurrent.futures import ThreadPoolExecutor
+
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
+        return self._executor
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+
+    def get_delay(self):
+        if len(self.tracker) < self.min_samples:
+            return None
+
+        return max(self.min_delay, self.tracker.percentile(self.percentile))
+
+    def add(self, laps):
+        self.tracker.add(laps)
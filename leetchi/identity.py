@@ -0,0 +1,61 @@
+import threading
+
+
+class IdentityMap(object):
+    """
+    Map each (model, primary key) to a single instance.
+    """
+
+    def __init__(self):
+        self._instances = {}
+        self._lock = threading.Lock()
+
+    def get(self, model, pk):
+        return self._instances.get((model, pk))
+
+    def add(self, instance):
+        pk = instance.get_pk()
+
+        if pk is None:
+            return instance
+
+        with self._lock:
+            return self._instances.setdefault((instance.__class__, pk), instance)
+
+    def merge(self, model, pairs, handler, projection=None):
+        """
+        Return the instance registered for the primary key of ``pairs``
+        updated with its data, or None when it is not registered.
+
+        ``projection`` is the names of the fields retrieved, None for all of them.
+        """
+        instance = self.get(model, pairs.get(model._meta.pk_name))
+
+        if instance is None:
+            return None
+
+        # the changes not saved yet win over the values from the API
+        dirty = instance.get_dirty_fields()
+
+        merged = [key for key in pairs if key not in dirty]
+
+        for key in merged:
+            setattr(instance, key, pairs[key])
+
+        # fresh values from the API are not changes to send
+        instance.mark_clean(merged)
+        instance.mark_loaded(projection)
+
+        instance.handler = handler
+
+        return instance
+
+    def clear(self):
+        with self._lock:
+            self._instances.clear()
+
+    def __contains__(self, instance):
+        return self.get(instance.__class__, instance.get_pk()) is instance
+
+    def __len__(self):
+        return len(self._instances)
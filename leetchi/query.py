@@ -1,9 +1,255 @@
-import six
+
+from itertools import islice
 
 from .exceptions import APIError
+from .utils import run_concurrently
+
+
+def prefetch_related(instances, names, handler=None, concurrency=10):
+    """
+    Fetch the distinct objects referenced by the foreign keys ``names``
+    of ``instances`` with at most ``concurrency`` requests in flight
+    and store them in the related object cache of each instance.
+    """
+    from .fields import ForeignRelatedObject
+
+    instances = [instance for instance in instances if instance is not None]
+
+    if not instances:
+        return instances
+
+    handler = handler or instances[0].handler
+
+    descriptors = []
+
+    for name in names:
+        descriptor = getattr(instances[0].__class__, name, None)
+
+        if not isinstance(descriptor, ForeignRelatedObject):
+            raise AttributeError('%s is not a foreign key of %s' % (name, instances[0].__class__.__name__))
+
+        descriptors.append(descriptor)
+
+    # distinct (model, reference) pairs of every foreign key, fetched together
+    references = list(set((descriptor.to, getattr(instance, descriptor.field_name))
+                          for descriptor in descriptors
+                          for instance in instances
+                          if not getattr(instance, descriptor.cache_name, None) and
+                          getattr(instance, descriptor.field_name, None) is not None))
+
+    def fetch(reference):
+        model, pk = reference
+
+        try:
+            return model.select(handler=handler).get(pk, handler=handler)
+        except model.DoesNotExist:
+            return None
+
+    futures = run_concurrently(handler.executor, fetch, references, concurrency)
+
+    related = dict((reference, future.result()) for reference, future in zip(references, futures))
+
+    for descriptor in descriptors:
+        for instance in instances:
+            obj = related.get((descriptor.to, getattr(instance, descriptor.field_name, None)))
+
+            if obj is not None:
+                setattr(instance, descriptor.cache_name, obj)
+
+    return instances
+
+
+class ResultList(list):
+    """
+    A list of instances which can prefetch their related objects.
+    """
+
+    def __init__(self, instances=(), handler=None):
+        super(ResultList, self).__init__(instances)
+
+        self.handler = handler
+
+    def prefetch(self, *names, **kwargs):
+        prefetch_related(self, names, handler=self.handler, **kwargs)
+
+        return self
+
+
+class LazyResultList(object):
+    """
+    The instances related to a resource, fetched page by page of
+    ``per_page`` entries while iterating and built on demand.
+
+    Without ``per_page`` the collection is fetched in one request the first
+    time it is needed, only the raw entries are kept.
+    """
+
+    chunk_size = 100
+
+    def __init__(self, query, reference, resource_model, handler, per_page=None):
+        self.query = query
+        self.reference = reference
+        self.resource_model = resource_model
+        self.handler = handler
+        self.per_page = per_page
+
+        self.prefetch_names = query.prefetch_names
+        self.prefetch_concurrency = query.prefetch_concurrency
+
+        self._page = None
+        self._count = None
+
+        # first entry of each page retrieved, to detect an API ignoring paging
+        self._first_entries = {}
+        self._paging_ignored = False
+
+    def prefetch(self, *names, **kwargs):
+        self.prefetch_names = names
+        self.prefetch_concurrency = kwargs.get('concurrency', self.prefetch_concurrency)
+
+        return self
+
+    def get_page(self, number):
+        """
+        Return the raw entries of the page ``number`` (starting at 1),
+        only the last page retrieved is kept.
+        """
+        if self.per_page is None:
+            number = 1
+
+        if self._page is not None and self._page[0] == number:
+            return self._page[1]
+
+        if number > 1:
+            if 1 not in self._first_entries:
+                self.get_page(1)
+
+            # past the end of the collection
+            if self._paging_ignored or (self._count is not None and
+                                        (number - 1) * self.per_page >= self._count):
+                return []
+
+        url = self.query.get_list_url(self.reference, self.resource_model)
+
+        if self.per_page is not None:
+            url += '?page=%d&per_page=%d' % (number, self.per_page)
+
+        result, entries = self.handler.request(self.query.method, url)
+
+        entries = entries or []
+
+        if entries:
+            # a page starting like a previous one means paging is ignored,
+            # the first page held the whole collection
+            if entries[0] in [entry for n, entry in self._first_entries.items() if n < number]:
+                self._paging_ignored = True
+
+                if self._count is None:
+                    self._count = self.per_page
+
+                return []
+
+            self._first_entries[number] = entries[0]
+
+        if self.is_last_page(entries):
+            self._count = (number - 1) * (self.per_page or 0) + len(entries)
+
+        self._page = (number, entries)
+
+        return entries
+
+    def is_last_page(self, entries):
+        # a page larger than requested means paging is not supported
+        return self.per_page is None or len(entries) != self.per_page
+
+    def build(self, entries):
+        instances = ResultList([self.query.build_result(entry, self.handler) for entry in entries],
+                               handler=self.handler)
+
+        if self.prefetch_names:
+            instances.prefetch(*self.prefetch_names, concurrency=self.prefetch_concurrency)
+
+        return instances
+
+    def iterate(self, start=0):
+        number = 1 if self.per_page is None else start // self.per_page + 1
+        offset = start if self.per_page is None else start % self.per_page
+
+        # the first page holds the whole collection when it is larger than requested
+        if number > 1 and len(self.get_page(1)) > self.per_page:
+            number, offset = 1, start
+
+        while True:
+            entries = self.get_page(number)
+
+            # build the instances by chunks when the collection is not paginated
+            for i in range(offset, len(entries), self.per_page or self.chunk_size):
+                for instance in self.build(entries[i:i + (self.per_page or self.chunk_size)]):
+                    yield instance
+
+            if self.is_last_page(entries):
+                return
+
+            number += 1
+            offset = 0
+
+    def __iter__(self):
+        return self.iterate()
+
+    def __len__(self):
+        number = 1
+
+        while self._count is None:
+            self.get_page(number)
+
+            number += 1
+
+        return self._count
+
+    def __bool__(self):
+        return bool(self.get_page(1))
+
+    __nonzero__ = __bool__
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            if (key.start or 0) < 0 or (key.stop or 0) < 0:
+                return list(self)[key]
+
+            start = key.start or 0
+
+            stop = None if key.stop is None else max(key.stop - start, 0)
+
+            return list(islice(self.iterate(start), 0, stop, key.step))
+
+        if key < 0:
+            key += len(self)
+
+        if key >= 0:
+            for instance in islice(self.iterate(key), 1):
+                return instance
+
+        raise IndexError('list index out of range')
+
+    def __eq__(self, other):
+        if isinstance(other, (list, LazyResultList)):
+            return list(self) == list(other)
+
+        return NotImplemented
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '<%s: %s>' % (self.__class__.__name__, self.query.model.__name__)
 
 
 class BaseQuery(object):
+    # names of the fields retrieved, None for all of them
+    projection = None
+
     def __init__(self, model, method=None, **kwargs):
         self.model = model
         self.method = method
@@ -14,13 +260,40 @@ class BaseQuery(object):
                     for field in self.model._meta.fields.values())
 
     def parse_result(self, result):
-        pairs = {}
-        for api_name, field_name in self.get_field_transcription().items():
-            field = self.model._meta.get_field_by_name(field_name)
-            if result and api_name in result:
-                pairs[field_name] = field.python_value(result[api_name])
+        return self.model._meta.get_decoder(self.projection)(result)
+
+    def build_instance(self, pairs, handler):
+        identity_map = handler.get_identity_map()
 
-        return pairs
+        if identity_map is None:
+            return self.hydrate(pairs, handler)
+
+        instance = identity_map.merge(self.model, pairs, handler, self.projection)
+
+        if instance is None:
+            instance = identity_map.add(self.hydrate(pairs, handler))
+
+        return instance
+
+    def hydrate(self, pairs, handler):
+        instance = self.model(handler=handler)
+
+        if self.projection is None:
+            instance._data.update(pairs)
+        else:
+            # deferred fields do not hold their defaults
+            for name, value in instance._data.items():
+                if name in self.projection:
+                    pairs.setdefault(name, value)
+
+            instance._data = pairs
+            instance.mark_loaded(self.projection, reset=True)
+
+        return instance
+
+    def invalidate(self, handler, reference):
+        if handler.cache is not None and reference is not None:
+            handler.cache.delete(self.model, reference)
 
     def parse_url(self, meta_url, params=None):
         if isinstance(meta_url, dict):
@@ -40,41 +313,268 @@ class SelectQuery(BaseQuery):
     def __init__(self, model, *args, **kwargs):
         super(SelectQuery, self).__init__(model, 'GET', **kwargs)
 
-    def get(self, reference, handler=None, resource_model=None, **kwargs):
-        handler = handler or self.handler
+        self.prefetch_names = ()
+        self.prefetch_concurrency = 10
+        self.lazy_decoding = False
+        self.record_mode = False
 
+    def prefetch(self, *names, **kwargs):
+        self.prefetch_names = names
+        self.prefetch_concurrency = kwargs.get('concurrency', self.prefetch_concurrency)
+
+        return self
+
+    def only(self, *names):
+        """
+        Only retrieve the fields (or foreign keys) ``names``, the primary key
+        and the fields of ``Meta.url``, the other fields are None.
+        """
+        self.projection = (self.model._meta.resolve_fields(names) |
+                           frozenset([self.model._meta.pk_name]) |
+                           self.model._meta.url_fields)
+
+        return self
+
+    def defer(self, *names):
+        """
+        Retrieve every field except ``names``, the primary key and the fields
+        of ``Meta.url`` are always retrieved.
+        """
+        projection = self.projection
+
+        if projection is None:
+            projection = frozenset(self.model._meta.fields)
+
+        self.projection = projection - (self.model._meta.resolve_fields(names) -
+                                        frozenset([self.model._meta.pk_name]) -
+                                        self.model._meta.url_fields)
+
+        return self
+
+    def records(self, enabled=True):
+        """
+        Build compact read-only records (see ``leetchi.records``) instead
+        of model instances for the entries of lists.
+        """
+        self.record_mode = enabled
+
+        return self
+
+    def lazy(self, enabled=True):
+        """
+        Decode the fields of the instances of lists on first access
+        instead of when the response is parsed.
+        """
+        self.lazy_decoding = enabled
+
+        return self
+
+    def build_result(self, entry, handler):
+        """
+        Build the instance of an entry of a list response.
+        """
+        if self.record_mode:
+            return self.model._meta.get_record_decoder(self.projection)(entry or {}, handler)
+
+        # the identity map merges decoded values
+        if self.lazy_decoding and self.projection is None and handler.get_identity_map() is None:
+            return self.model.from_api(entry, handler)
+
+        return self.build_instance(self.parse_result(entry), handler)
+
+    def get_url(self, reference, resource_model=None, **kwargs):
         url = getattr(self.model._meta, 'url', None)
 
         if url is not None:
-            url = self.parse_url(url, kwargs)
+            return self.parse_url(url, kwargs)
 
-        try:
-            if url is None:
-                if resource_model is None:
-                    url = '/%s/%d' % (self.model._meta.verbose_name_plural,
-                                      reference)
-                else:
-                    url = '/%s/%d/%s' % (resource_model._meta.verbose_name_plural,
-                                         reference,
-                                         self.model._meta.verbose_name_plural)
+        if resource_model is None:
+            return '/%s/%d' % (self.model._meta.verbose_name_plural,
+                               reference)
+
+        return '/%s/%d/%s' % (resource_model._meta.verbose_name_plural,
+                              reference,
+                              self.model._meta.verbose_name_plural)
+
+    def get_list_url(self, reference, resource_model):
+        return '/%s/%d/%s' % (resource_model._meta.verbose_name_plural, reference,
+                              self.model._meta.verbose_name_plural)
+
+    def does_not_exist(self, reference):
+        return self.model.DoesNotExist('instance %s matching reference %d does not exist' % (self.model._meta.model_name, reference))
+
+    def parse_error(self, error, reference, handler=None, url=None):
+        if error.code == 404:
+            if handler is not None and handler.negative_cache is not None:
+                handler.negative_cache.add(self.model, url)
+
+            return self.does_not_exist(reference)
+
+        return error
+
+    def check_status(self, result, data):
+        # 404 responses are decoded by the handler, turn them back into an error
+        if result.status_code == 404:
+            raise APIError(result.content, code=404, content=data)
+
+    def check_missing(self, handler, url, reference):
+        if handler.negative_cache is not None and handler.negative_cache.contains(self.model, url):
+            raise self.does_not_exist(reference)
 
+    def get_cache(self, handler, resource_model=None):
+        """
+        Return the cache of the handler when the lookup is made by primary key
+        and retrieves every field.
+        """
+        if (resource_model is None and self.projection is None and
+                getattr(self.model._meta, 'url', None) is None):
+            return handler.cache
+
+        return None
+
+    def get(self, reference, handler=None, resource_model=None, **kwargs):
+        handler = handler or self.handler
+
+        cache = self.get_cache(handler, resource_model)
+
+        if cache is not None:
+            pairs = cache.get(self.model, reference)
+
+            if pairs is not None:
+                return self.build_instance(pairs, handler)
+
+        return self.fetch(reference, handler, resource_model, **kwargs)
+
+    def fetch(self, reference, handler=None, resource_model=None, **kwargs):
+        """
+        Retrieve the instance from the API and store it in the cache.
+        """
+        handler = handler or self.handler
+
+        url = self.get_url(reference, resource_model, **kwargs)
+
+        self.check_missing(handler, url, reference)
+
+        cache = self.get_cache(handler, resource_model)
+
+        try:
             result, data = handler.request(self.method, url)
+
+            self.check_status(result, data)
         except APIError as e:
-            if e.code == 404:
-                raise self.model.DoesNotExist('instance %s matching reference %d does not exist' % (self.model._meta.model_name, reference))
+            error = self.parse_error(e, reference, handler, url)
+
+            if cache is not None and isinstance(error, self.model.DoesNotExist):
+                cache.delete(self.model, reference)
 
-            raise e
+            raise error
         else:
-            return self.model(**dict(self.parse_result(data), **{'handler': handler}))
+            pairs = self.parse_result(data)
+
+            if cache is not None:
+                cache.set(self.model, reference, pairs)
+
+            return self.build_instance(pairs, handler)
+
+    def get_many(self, references, handler=None, concurrency=10):
+        """
+        Retrieve the distinct ``references`` concurrently on the handler
+        thread pool and return the instances in the order of ``references``.
+
+        A reference which failed comes back as its exception
+        (``DoesNotExist`` or ``APIError``) instead of aborting the batch.
+        """
+        handler = handler or self.handler
+
+        distinct = []
+        seen = set()
+
+        for reference in references:
+            if reference not in seen:
+                seen.add(reference)
+                distinct.append(reference)
+
+        def fetch(reference):
+            try:
+                return self.get(reference, handler=handler)
+            except (self.model.DoesNotExist, APIError) as e:
+                return e
+
+        futures = run_concurrently(handler.executor, fetch, distinct, concurrency)
+
+        results = dict((reference, future.result()) for reference, future in zip(distinct, futures))
+
+        return [results[reference] for reference in references]
+
+    def get_stale(self, reference, handler=None, max_staleness=60):
+        """
+        Return the cached instance at once when it is younger than
+        ``max_staleness`` seconds, even if it expired, and refresh it
+        in background. Requires a cache on the handler.
+        """
+        handler = handler or self.handler
+
+        cache = self.get_cache(handler)
+
+        if cache is None:
+            return self.get(reference, handler)
+
+        entry = cache.get_entry(self.model, reference)
+
+        if entry is None or entry[1] > max_staleness:
+            return self.get(reference, handler)
+
+        pairs, age = entry
+
+        if age > cache.get_ttl(self.model):
+            handler.schedule(('refresh', self.model, reference), self.fetch, reference, handler)
+
+        return self.build_instance(pairs, handler)
+
+    def aget(self, reference, handler=None, resource_model=None, **kwargs):
+        from .aio import select_get
+
+        return select_get(self, reference, handler, resource_model, **kwargs)
 
     def list(self, reference, resource_model, handler=None):
         handler = handler or self.handler
 
         result, data = handler.request(self.method,
-                                       '/%s/%d/%s' % (resource_model._meta.verbose_name_plural, reference,
-                                                      self.model._meta.verbose_name_plural))
+                                       self.get_list_url(reference, resource_model))
+
+        instances = ResultList([self.build_result(entry, handler) for entry in data],
+                               handler=handler)
+
+        if self.prefetch_names:
+            instances.prefetch(*self.prefetch_names, concurrency=self.prefetch_concurrency)
+
+        return instances
+
+    def stream(self, reference, resource_model, handler=None, chunk_size=8192):
+        """
+        Yield the instances related to ``reference`` one by one while
+        the response is downloaded and decoded, nothing is kept in memory.
+        """
+        handler = handler or self.handler
+
+        for entry in handler.stream(self.method,
+                                    self.get_list_url(reference, resource_model),
+                                    chunk_size=chunk_size):
+            yield self.build_result(entry, handler)
+
+    def iterator(self, reference, resource_model, handler=None, per_page=None):
+        """
+        Return the instances related to ``reference`` as a lazy list fetched
+        page by page, ``per_page`` defaults to the ``per_page`` Meta option.
+        """
+        return LazyResultList(self, reference, resource_model,
+                              handler or self.handler,
+                              per_page or getattr(self.model._meta, 'per_page', None))
 
-        return [self.model(**dict(self.parse_result(entry), **{'handler': handler})) for entry in data]
+    def alist(self, reference, resource_model, handler=None):
+        from .aio import select_list
+
+        return select_list(self, reference, resource_model, handler)
 
 
 class InsertQuery(BaseQuery):
@@ -88,32 +588,37 @@ class InsertQuery(BaseQuery):
         self.insert_query = kwargs
 
     def parse_insert(self):
-        pairs = {}
-        for k, v in six.iteritems(self.insert_query):
-            field = self.model._meta.get_field_by_name(k)
+        return self.model._meta.encoder(self.insert_query)
+
+    def get_url(self):
+        url = getattr(self.model._meta, 'url', None)
 
-            if field.required or v is not None:
-                pairs[field.api_name] = field.api_value(v)
+        if url:
+            return self.parse_url(url, self.insert_query)
 
-        return pairs
+        return '/%s/' % self.model._meta.verbose_name_plural
 
-    def execute(self, handler=None):
+    def execute(self, handler=None, idempotency_key=None):
         handler = handler or self.handler
 
-        data = self.parse_insert()
+        result, data = handler.request(self.method,
+                                       self.get_url(),
+                                       data=self.parse_insert(),
+                                       idempotency_key=idempotency_key)
+
+        pairs = self.parse_result(data)
 
-        url = getattr(self.model._meta, 'url', None)
+        self.invalidate(handler, pairs.get(self.model._meta.pk_name))
 
-        if url:
-            url = self.parse_url(url, self.insert_query)
-        else:
-            url = '/%s/' % self.model._meta.verbose_name_plural
+        if handler.negative_cache is not None:
+            handler.negative_cache.discard(self.model)
 
-        result, data = handler.request(self.method,
-                                       url,
-                                       data=data)
+        return dict(pairs, **{'handler': handler})
+
+    def aexecute(self, handler=None, idempotency_key=None):
+        from .aio import insert_execute
 
-        return dict(self.parse_result(data), **{'handler': handler})
+        return insert_execute(self, handler, idempotency_key)
 
 
 class UpdateQuery(BaseQuery):
@@ -127,30 +632,32 @@ class UpdateQuery(BaseQuery):
         self.update_query = kwargs
         self.reference = reference
 
+        # values formatted in Meta.url, the update query by default
+        self.url_params = None
+
     def parse_update(self):
-        pairs = {}
-        for k, v in six.iteritems(self.update_query):
-            field = self.model._meta.get_field_by_name(k)
+        return self.model._meta.encoder(self.update_query)
+
+    def get_url(self):
+        url = getattr(self.model._meta, 'url', None)
 
-            if field.required or v is not None:
-                pairs[field.api_name] = field.api_value(v)
+        if url:
+            return self.parse_url(url, self.update_query if self.url_params is None else self.url_params)
 
-        return pairs
+        return '/%s/%d/' % (self.model._meta.verbose_name_plural, self.reference)
 
     def execute(self, handler=None):
         handler = handler or self.handler
 
-        data = self.parse_update()
+        result, data = handler.request(self.method,
+                                       self.get_url(),
+                                       data=self.parse_update())
 
-        url = getattr(self.model._meta, 'url', None)
+        self.invalidate(handler, self.reference)
 
-        if url:
-            url = self.parse_url(url, self.update_query)
-        else:
-            url = '/%s/%d/' % (self.model._meta.verbose_name_plural, self.reference)
+        return self.parse_result(data)
 
-        result, data = handler.request(self.method,
-                                       url,
-                                       data=data)
+    def aexecute(self, handler=None):
+        from .aio import update_execute
 
-        return self.parse_result(data)
+        return update_execute(self, handler)
@@ -0,0 +1,107 @@
+from array import array
+
+try:
+    array('q')
+    ID_TYPECODE = 'q'
+except ValueError:
+    ID_TYPECODE = 'l'
+
+
+class BaseRecord(object):
+    """
+    A compact read-only row of a model: one slot per field,
+    no per-instance dict, no dirty tracking and no related objects.
+    """
+
+    __slots__ = ('handler',)
+
+    model = None
+
+    # names of the fields, one slot each
+    field_names = ()
+
+    # names of the fields retrieved, None for all of them
+    loaded_fields = None
+
+    def __setattr__(self, name, value):
+        raise AttributeError('%s is read-only, use to_model() to change it' % self.__class__.__name__)
+
+    def __delattr__(self, name):
+        raise AttributeError('%s is read-only, use to_model() to change it' % self.__class__.__name__)
+
+    def get_pk(self):
+        return getattr(self, self.model._meta.pk_name)
+
+    def get_field_dict(self):
+        return dict((name, getattr(self, name)) for name in self.field_names)
+
+    def to_model(self):
+        """
+        Return a full instance of the model, to save it or follow its relations.
+        """
+        pairs = dict((name, list(value) if isinstance(value, array) else value)
+                     for name, value in self.get_field_dict().items())
+
+        instance = self.model(**dict(pairs, **{'handler': self.handler}))
+        instance.mark_clean()
+
+        if self.loaded_fields is not None:
+            instance.mark_loaded(self.loaded_fields, reset=True)
+
+        return instance
+
+    def __eq__(self, other):
+        return (isinstance(other, BaseRecord) and
+                other.model is self.model and
+                self.get_pk() is not None and
+                other.get_pk() == self.get_pk())
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        pk = self.get_pk()
+
+        if pk is None:
+            raise TypeError('%s instances without primary key are unhashable' % self.__class__.__name__)
+
+        return hash((self.model, pk))
+
+    def __repr__(self):
+        return '<%s: %s>' % (self.__class__.__name__, self.get_pk())
+
+
+def create_record_class(model):
+    names = tuple(sorted(model._meta.fields))
+
+    return type('%sRecord' % model.__name__, (BaseRecord,), {
+        '__slots__': names,
+        'field_names': names,
+        'model': model,
+    })
+
+
+def create_projected_record_class(record_class, names):
+    """
+    Return a subclass of ``record_class`` holding the fields ``names`` retrieved.
+    """
+    return type(record_class.__name__, (record_class,), {
+        '__slots__': (),
+        'loaded_fields': frozenset(names),
+    })
+
+
+def get_id_array_converter(convert=None):
+    """
+    Wrap the converter of a list of ids to store the ids in a typed array.
+    """
+    def to_id_array(values):
+        if convert is not None:
+            values = convert(values)
+
+        if values is None:
+            return values
+
+        return array(ID_TYPECODE, values)
+
+    return to_id_array
@@ -0,0 +1,101 @@
+import random
+import threading
+import time
+
+from email.utils import parsedate_tz, mktime_tz
+
+
+class RetryBudget(object):
+    """
+    Cap retries to a ratio of the requests sent so retries cannot
+    amplify an outage.
+
+    Every request deposits ``ratio`` token, every retry withdraws one,
+    the bucket holds at most ``max_tokens``.
+    """
+
+    def __init__(self, ratio=0.1, max_tokens=10):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = float(max_tokens)
+
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            if self.tokens < 1:
+                return False
+
+            self.tokens -= 1
+
+            return True
+
+
+class RetryPolicy(object):
+    """
+    Retry idempotent requests on connection errors and transient statuses
+    with a jittered exponential backoff.
+
+    POST requests are only retried when they carry an idempotency key.
+    """
+
+    idempotent_methods = ('GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS')
+
+    def __init__(self, max_retries=3, backoff_factor=0.1, max_backoff=10.0,
+                 statuses=(429, 500, 502, 503, 504), budget=None):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.statuses = statuses
+        self.budget = budget if budget is not None else RetryBudget()
+
+    def is_retryable(self, method, idempotency_key=None):
+        return method in self.idempotent_methods or (method == 'POST' and bool(idempotency_key))
+
+    def get_backoff(self, attempt):
+        return random.uniform(0, min(self.max_backoff, self.backoff_factor * (2 ** attempt)))
+
+    def parse_retry_after(self, value):
+        if not value:
+            return None
+
+        try:
+            return max(float(value), 0)
+        except ValueError:
+            pass
+
+        date = parsedate_tz(value)
+
+        if date is None:
+            return None
+
+        return max(mktime_tz(date) - time.time(), 0)
+
+    def get_retry_delay(self, method, attempt, idempotency_key=None, retry_after=None,
+                        remaining=None):
+        """
+        Return the number of seconds to wait before the next attempt
+        or None when the request must not be retried, ``remaining`` is the
+        number of seconds left before the deadline.
+        """
+        if attempt >= self.max_retries or not self.is_retryable(method, idempotency_key):
+            return None
+
+        delay = self.parse_retry_after(retry_after)
+
+        if delay is None:
+            delay = self.get_backoff(attempt)
+        elif delay > self.max_backoff:
+            return None
+
+        if remaining is not None and delay >= remaining:
+            return None
+
+        if not self.budget.withdraw():
+            return None
+
+        return delay
@@ -0,0 +1,118 @@
+import json as stdlib_json
+
+from .utils import force_bytes
+
+try:
+    import simplejson
+except ImportError:
+    simplejson = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class BaseCodec(object):
+    """
+    Serialize request bodies to bytes and decode response contents from bytes.
+    """
+
+    def dumps(self, obj):
+        raise NotImplementedError
+
+    def loads(self, data):
+        raise NotImplementedError
+
+    def get_raw_decoder(self):
+        """
+        Return a decoder with a ``raw_decode`` method used to decode
+        streamed responses.
+        """
+        return stdlib_json.JSONDecoder()
+
+
+class JSONCodec(BaseCodec):
+    """
+    Encode and decode with the standard library ``json`` module.
+    """
+
+    module = stdlib_json
+
+    def dumps(self, obj):
+        return force_bytes(self.module.dumps(obj))
+
+    def loads(self, data):
+        return self.module.loads(data)
+
+    def get_raw_decoder(self):
+        return self.module.JSONDecoder()
+
+
+class SimpleJSONCodec(JSONCodec):
+    """
+    Encode and decode with ``simplejson``.
+    """
+
+    module = simplejson
+
+    def __init__(self):
+        if simplejson is None:
+            raise ImportError('simplejson is required to use %s' % self.__class__.__name__)
+
+
+class OrjsonCodec(BaseCodec):
+    """
+    Encode and decode with ``orjson`` which works on bytes natively.
+    """
+
+    def __init__(self):
+        if orjson is None:
+            raise ImportError('orjson is required to use %s' % self.__class__.__name__)
+
+    def dumps(self, obj):
+        return orjson.dumps(obj)
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+
+codec_backends = {
+    'json': JSONCodec,
+    'simplejson': SimpleJSONCodec,
+    'orjson': OrjsonCodec,
+}
+
+
+def get_available_codecs():
+    codecs = ['json']
+
+    if simplejson is not None:
+        codecs.insert(0, 'simplejson')
+
+    if orjson is not None:
+        codecs.insert(0, 'orjson')
+
+    return codecs
+
+
+def get_codec(backend=None):
+    """
+    Return a codec for ``backend`` which can be a registered backend name,
+    ``'auto'`` to pick the fastest available one or a codec instance.
+    simplejson is used when ``backend`` is None and it is installed,
+    the standard library otherwise.
+    """
+    if backend is None:
+        backend = 'simplejson' if simplejson is not None else 'json'
+    elif backend == 'auto':
+        backend = get_available_codecs()[0]
+
+    if hasattr(backend, 'dumps'):
+        return backend
+
+    if backend not in codec_backends:
+        raise ValueError('Unknown codec %s, available codecs: %s' % (
+            backend, ', '.join(sorted(codec_backends))))
+
+    return codec_backends[backend]()
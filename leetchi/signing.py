@@ -0,0 +1,185 @@
+import six
+import threading
+
+from .utils import openssl_pkey_get_private, openssl_sign, force_bytes
+
+try:
+    from cryptography.hazmat.backends import default_backend
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import padding
+except ImportError:
+    serialization = None
+
+
+class BaseSigner(object):
+    def sign(self, data):
+        raise NotImplementedError
+
+    def __call__(self, data):
+        return self.sign(data)
+
+
+class RSASigner(BaseSigner):
+    """
+    Sign request payloads with a RSA private key using PyCrypto
+    (or PyCryptodome).
+
+    The key is decrypted and parsed once, the first time it is needed,
+    and then reused for every signature.
+    """
+
+    def __init__(self, private_key, password=None):
+        self.private_key = private_key
+        self.password = password
+
+        self._key = None
+
+    @property
+    def key(self):
+        if self._key is None:
+            self._key = openssl_pkey_get_private(self.private_key, self.password)
+
+        return self._key
+
+    def sign(self, data):
+        return openssl_sign(data, self.key)
+
+
+class CryptographySigner(RSASigner):
+    """
+    Sign request payloads with the OpenSSL bindings of ``cryptography``.
+    """
+
+    def __init__(self, private_key, password=None):
+        if serialization is None:
+            raise ImportError('cryptography is required to use %s' % self.__class__.__name__)
+
+        super(CryptographySigner, self).__init__(private_key, password)
+
+    @property
+    def key(self):
+        if self._key is None:
+            password = force_bytes(self.password) if self.password else None
+
+            self._key = serialization.load_pem_private_key(force_bytes(self.private_key),
+                                                           password=password,
+                                                           backend=default_backend())
+
+        return self._key
+
+    def sign(self, data):
+        return self.key.sign(force_bytes(data), padding.PKCS1v15(), hashes.SHA1())
+
+
+class CallableSigner(BaseSigner):
+    """
+    Wrap a user supplied callable which takes the formatted data
+    and returns the raw signature.
+    """
+
+    def __init__(self, func):
+        self.func = func
+
+    def sign(self, data):
+        return self.func(data)
+
+
+# signers of a worker process keyed by backend, key and password
+_worker_signers = {}
+
+
+def _worker_sign(backend, private_key, password, data):
+    # the key is parsed on the first job of each worker, executor
+    # initializers are missing before Python 3.7 and in the futures backport
+    key = (backend, private_key, password)
+
+    signer = _worker_signers.get(key)
+
+    if signer is None:
+        signer = _worker_signers[key] = get_signer(backend, private_key, password)
+
+    return signer.sign(data)
+
+
+class ProcessPoolSigner(BaseSigner):
+    """
+    Sign request payloads in a pool of worker processes, each worker
+    holds its own parsed key.
+
+    ``submit`` returns a future, ``sign`` waits for it so the signer
+    can be used as a drop-in replacement of the other ones.
+    """
+
+    def __init__(self, private_key, password=None, backend=None, max_workers=None):
+        if backend is not None and not isinstance(backend, six.string_types):
+            raise ValueError('%s requires a backend name' % self.__class__.__name__)
+
+        self.private_key = private_key
+        self.password = password
+        self.backend = backend
+        self.max_workers = max_workers
+
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    from concurrent.futures import ProcessPoolExecutor
+
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+
+        return self._executor
+
+    def submit(self, data):
+        return self.executor.submit(_worker_sign, self.backend, self.private_key, self.password, data)
+
+    def sign(self, data):
+        return self.submit(data).result()
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+
+
+signer_backends = {
+    'pycrypto': RSASigner,
+    'cryptography': CryptographySigner,
+}
+
+
+def get_available_backends():
+    backends = ['pycrypto']
+
+    if serialization is not None:
+        backends.insert(0, 'cryptography')
+
+    return backends
+
+
+def get_signer(backend, private_key, password=None):
+    """
+    Return a signer for ``backend`` which can be a registered backend name,
+    ``'auto'`` to pick the fastest available one, a signer instance
+    or a callable. PyCrypto is used when ``backend`` is None.
+    """
+    if backend is None:
+        backend = 'pycrypto'
+    elif backend == 'auto':
+        backend = get_available_backends()[0]
+
+    if hasattr(backend, 'sign'):
+        return backend
+
+    if callable(backend):
+        return CallableSigner(backend)
+
+    if backend not in signer_backends:
+        raise ValueError('Unknown signer backend %s, available backends: %s' % (
+            backend, ', '.join(sorted(signer_backends))))
+
+    return signer_backends[backend](private_key, password)
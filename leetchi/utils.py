@@ -2,16 +2,30 @@
 from __future__ import unicode_literals
 
 import six
+import codecs
 import datetime
+import threading
 
 from decimal import Decimal
 
 from functools import wraps
 
+try:
+    import contextvars
+except ImportError:
+    contextvars = None
+
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
 from Crypto.PublicKey import RSA
 from Crypto.Hash import SHA
 from Crypto.Signature import PKCS1_v1_5
 
+from .exceptions import DeadlineExceeded
+
 if six.PY3:
     from urllib import request
     orig = request.URLopener.open_https
@@ -239,3 +253,254 @@ def memoize(func, cache, num_args):
         cache[mem_args] = result
         return result
     return wrapper
+
+
+class ContextLocal(object):
+    """
+    A value local to the current context (a context variable)
+    or to the current thread when contextvars is not available.
+    """
+
+    def __init__(self, name):
+        if contextvars is not None:
+            self._var = contextvars.ContextVar(name, default=None)
+        else:
+            self._local = threading.local()
+
+    def get(self):
+        if contextvars is not None:
+            return self._var.get()
+
+        return getattr(self._local, 'value', None)
+
+    def set(self, value):
+        """
+        Set the value and return a token to restore the previous one.
+        """
+        if contextvars is not None:
+            return self._var.set(value)
+
+        token = self.get()
+        self._local.value = value
+        return token
+
+    def reset(self, token):
+        if contextvars is not None:
+            self._var.reset(token)
+        else:
+            self._local.value = token
+
+
+class ContextMap(object):
+    """
+    Values local to the current context keyed by an object (a handler),
+    held by a single context variable as context variables are never freed.
+    """
+
+    def __init__(self, name):
+        self._local = ContextLocal(name)
+
+    def get(self, key):
+        mapping = self._local.get()
+
+        if mapping is None:
+            return None
+
+        return mapping.get(key)
+
+    def set(self, key, value):
+        """
+        Set the value of ``key`` and return a token to restore the previous ones.
+        """
+        # the mapping is copied, the contexts sharing the previous one must not change
+        mapping = dict(self._local.get() or {})
+        mapping[key] = value
+
+        return self._local.set(mapping)
+
+    def reset(self, token):
+        self._local.reset(token)
+
+
+def submit(executor, func, *args, **kwargs):
+    """
+    Submit ``func`` to ``executor`` in a copy of the current context
+    so context variables (like the current deadline) follow the call.
+    """
+    if contextvars is not None:
+        return executor.submit(contextvars.copy_context().run, func, *args, **kwargs)
+
+    return executor.submit(func, *args, **kwargs)
+
+
+class SingleFlight(object):
+    """
+    Share one call between concurrent callers using the same key,
+    every caller receives the result (or the exception) of the first one.
+
+    The other callers wait at most until the current deadline, they receive
+    ``copy(result)`` when a ``copy`` function is given.
+    """
+
+    class Call(object):
+        def __init__(self):
+            self.event = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self, copy=None):
+        self.copy = copy
+
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+
+            leader = call is None
+
+            if leader:
+                call = self._calls[key] = self.Call()
+
+        if not leader:
+            from .deadline import get_current_deadline
+
+            current = get_current_deadline()
+
+            call.event.wait(None if current is None else max(current.remaining(), 0))
+
+            if not call.event.is_set():
+                raise DeadlineExceeded('Deadline of %s seconds exceeded' % current.timeout)
+
+            if call.error is not None:
+                raise call.error
+
+            if self.copy is not None:
+                return self.copy(call.result)
+
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+            call.event.set()
+
+        return call.result
+
+
+def run_concurrently(executor, func, items, concurrency=10):
+    """
+    Call ``func`` on each item in ``executor`` with at most ``concurrency``
+    calls in flight, return the futures in the order of ``items``.
+    """
+    from concurrent.futures import wait, FIRST_COMPLETED
+
+    futures = []
+    pending = set()
+
+    for item in items:
+        if len(pending) >= concurrency:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+        future = submit(executor, func, item)
+
+        futures.append(future)
+        pending.add(future)
+
+    wait(pending)
+
+    return futures
+
+
+class JSONArrayDecoder(object):
+    """
+    Decode the elements of a JSON array fed by chunks of bytes,
+    ``feed`` returns the elements completed by the chunk.
+    """
+
+    def __init__(self, decoder=None):
+        self.decoder = decoder or json.JSONDecoder()
+
+        self._text = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._started = False
+        self._finished = False
+
+    def feed(self, chunk, final=False):
+        self._buffer += self._text.decode(chunk, final)
+
+        return self._decode(final)
+
+    def close(self):
+        values = self.feed(b'', final=True)
+
+        if not self._finished:
+            raise ValueError('Unterminated JSON array')
+
+        return values
+
+    def _decode(self, final):
+        buf, pos, values = self._buffer, 0, []
+
+        while not self._finished:
+            while pos < len(buf) and (buf[pos].isspace() or (self._started and buf[pos] == ',')):
+                pos += 1
+
+            if pos == len(buf):
+                break
+
+            if not self._started:
+                if buf[pos] != '[':
+                    raise ValueError('Expecting a JSON array')
+
+                self._started = True
+                pos += 1
+            elif buf[pos] == ']':
+                self._finished = True
+                pos += 1
+            else:
+                try:
+                    value, end = self.decoder.raw_decode(buf, pos)
+                except ValueError:
+                    # the element is not complete yet
+                    if final:
+                        raise
+                    break
+
+                # a number is only complete once followed by a delimiter,
+                # "1." may continue as "1.5" in the next chunk
+                if buf[pos] not in '{["' and (end == len(buf) or buf[end] not in ',] \t\r\n'):
+                    if not final:
+                        break
+
+                    if end < len(buf):
+                        raise ValueError('Invalid JSON number: %r' % buf[pos:end + 1])
+
+                values.append(value)
+                pos = end
+
+        self._buffer = buf[pos:]
+
+        return values
+
+
+def iter_json_array(chunks, decoder=None):
+    """
+    Yield the elements of the JSON array read from ``chunks`` of bytes
+    as soon as they are complete.
+    """
+    array = JSONArrayDecoder(decoder)
+
+    for chunk in chunks:
+        for value in array.feed(chunk):
+            yield value
+
+    for value in array.close():
+        yield value
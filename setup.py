@@ -1,4 +1,6 @@
 import os
+import sys
+
 from setuptools import setup, find_packages
 
 root = os.path.abspath(os.path.dirname(__file__))
@@ -23,6 +25,18 @@ CLASSIFIERS = [
 
 KEYWORDS = 'leetchi api rest users wallets contributions'
 
+INSTALL_REQUIRES = [
+    'distribute',
+    'requests>=2.4',
+    'pycrypto==2.6.1',
+    'blinker==1.2',
+    'six==1.5.2'
+]
+
+# concurrent.futures backport for the thread and process pools
+if sys.version_info < (3,):
+    INSTALL_REQUIRES.append('futures')
+
 setup(
     name='python-leetchi',
     version=version,
@@ -34,13 +48,12 @@ setup(
     packages=find_packages(),
     include_package_data=True,
     zip_safe=False,
-    install_requires=[
-        'distribute',
-        'requests==2.1.0',
-        'pycrypto==2.6.1',
-        'blinker==1.2',
-        'six==1.5.2'
-    ],
+    install_requires=INSTALL_REQUIRES,
+    extras_require={
+        'cryptography': ['cryptography'],
+        'async': ['aiohttp'],
+        'orjson': ['orjson'],
+    },
     classifiers=CLASSIFIERS,
     keywords=KEYWORDS,
     tests_require=['nose', 'coverage', 'selenium'],
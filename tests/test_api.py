@@ -11,6 +11,52 @@ except ImportError:
 from .settings import API_PARTNER_ID
 
 
+class StubResponse(object):
+    def __init__(self, status_code=200, content=None, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.content = json.dumps(content).encode('utf-8') if content is not None else b''
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8')
+
+    def json(self):
+        return json.loads(self.content)
+
+    def close(self):
+        pass
+
+
+class StubSession(object):
+    """
+    A session which answers the requests with ``respond(method, url, **kwargs)``.
+    """
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.calls = []
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((method, url, kwargs))
+
+        return self.respond(method, url, **kwargs)
+
+    def close(self):
+        pass
+
+
+def get_stub_handler(respond, **kwargs):
+    from leetchi.api import LeetchiAPI
+
+    return LeetchiAPI(handler.partner_id,
+                      handler.private_key_password,
+                      private_key=handler.private_key,
+                      host='http://leetchi.test',
+                      session=StubSession(respond),
+                      **kwargs)
+
+
 class ApiTest(unittest.TestCase):
     def test_generate_host(self):
         timestamp = int(time.time())
@@ -41,3 +87,920 @@ class ApiTest(unittest.TestCase):
                              'data': json.dumps(data),
                              'partner_id': API_PARTNER_ID
                          })
+
+    def test_signer_is_reused(self):
+        signer = handler.signer
+
+        self.assertTrue(signer is handler.signer)
+
+        data = handler._format_data('GET', '/users/1?ts=%d' % int(time.time()), None)
+
+        self.assertEqual(signer.sign(data), signer.sign(data))
+
+    def test_signer_backends(self):
+        from leetchi.api import LeetchiAPI
+        from leetchi.signing import get_available_backends
+
+        data = handler._format_data('GET', '/users/1?ts=%d' % int(time.time()), None)
+
+        signatures = set()
+
+        for backend in get_available_backends():
+            h = LeetchiAPI(handler.partner_id,
+                           handler.private_key_password,
+                           private_key=handler.private_key,
+                           signer=backend)
+
+            signatures.add(h.signer.sign(data))
+
+        self.assertEqual(len(signatures), 1)
+
+        h = LeetchiAPI(handler.partner_id,
+                       handler.private_key_password,
+                       private_key=handler.private_key,
+                       signer=lambda data: b'signature')
+
+        self.assertEqual(h.signer.sign(data), b'signature')
+
+    def test_process_pool_signer(self):
+        from leetchi.api import LeetchiAPI
+
+        h = LeetchiAPI(handler.partner_id,
+                       handler.private_key_password,
+                       private_key=handler.private_key,
+                       signing_processes=2)
+
+        data = handler._format_data('GET', '/users/1?ts=%d' % int(time.time()), None)
+
+        futures = [h.signer.submit(data) for i in range(4)]
+
+        for future in futures:
+            self.assertEqual(future.result(), handler.signer.sign(data))
+
+        h.close()
+
+    def test_signer_created_once(self):
+        import threading
+
+        from leetchi.api import LeetchiAPI
+
+        h = LeetchiAPI(handler.partner_id,
+                       handler.private_key_password,
+                       private_key=handler.private_key,
+                       signing_processes=1)
+
+        signers = []
+
+        threads = [threading.Thread(target=lambda: signers.append(h.signer)) for i in range(8)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(set(id(signer) for signer in signers)), 1)
+
+        h.close()
+
+    def test_pool_stats(self):
+        from leetchi.api import LeetchiAPI
+        from leetchi.resources import User
+
+        h = LeetchiAPI(handler.partner_id,
+                       handler.private_key_password,
+                       private_key=handler.private_key,
+                       host=handler.host,
+                       pool_maxsize=2)
+
+        self.assertEqual(h.get_pool_stats(), {'hits': 0, 'misses': 0})
+
+        user = User(first_name='Mark', last_name='Zuckerberg',
+                    email='mark@leetchi.com', ip_address='127.0.0.1',
+                    nationality='FR')
+        user.save(h)
+
+        User.get(user.get_pk(), handler=h)
+
+        stats = h.get_pool_stats()
+
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hits'], 1)
+
+        h.close()
+
+    def test_retry_policy(self):
+        from leetchi.retry import RetryPolicy, RetryBudget
+
+        policy = RetryPolicy(max_retries=2, budget=RetryBudget(ratio=0, max_tokens=2))
+
+        self.assertTrue(policy.is_retryable('GET'))
+        self.assertTrue(policy.is_retryable('PUT'))
+        self.assertFalse(policy.is_retryable('POST'))
+        self.assertTrue(policy.is_retryable('POST', idempotency_key='contribution-1'))
+
+        self.assertEqual(policy.get_retry_delay('POST', 0), None)
+        self.assertEqual(policy.get_retry_delay('GET', 0, retry_after='3'), 3)
+        self.assertEqual(policy.get_retry_delay('GET', 2), None)
+        self.assertEqual(policy.get_retry_delay('GET', 0, retry_after='3600'), None)
+
+        self.assertTrue(policy.get_retry_delay('GET', 1) is not None)
+
+        # the budget is exhausted
+        self.assertEqual(policy.get_retry_delay('GET', 0), None)
+
+    def test_retried_requests(self):
+        from leetchi.exceptions import APIError
+        from leetchi.retry import RetryPolicy, RetryBudget
+
+        def get_handler(statuses, **kwargs):
+            responses = [StubResponse(status, {'ID': 1}, headers) for status, headers in statuses]
+
+            signed = []
+
+            h = get_stub_handler(lambda method, url, **kwargs: responses.pop(0),
+                                 signer=lambda data: signed.append(data) or b'signature',
+                                 **kwargs)
+
+            return h, signed
+
+        retry = RetryPolicy(max_retries=3, budget=RetryBudget(ratio=0, max_tokens=2))
+
+        h, signed = get_handler([(503, {'Retry-After': '0.2'}), (200, {})], retry=retry)
+
+        start = time.time()
+
+        result, data = h.request('GET', '/users/1')
+
+        # each attempt is signed again and waits for Retry-After
+        self.assertEqual(data, {'ID': 1})
+        self.assertEqual(len(h.session.calls), 2)
+        self.assertEqual(len(signed), 2)
+        self.assertTrue(time.time() - start >= 0.2)
+        self.assertEqual(retry.budget.tokens, 1)
+
+        # a creation without idempotency key is not retried
+        h, signed = get_handler([(503, {}), (200, {})], retry=retry)
+
+        self.assertRaises(APIError, h.request, 'POST', '/users/', {'FirstName': 'Mark'})
+        self.assertEqual(len(h.session.calls), 1)
+
+        # Retry-After past the deadline stops the retries
+        h, signed = get_handler([(503, {'Retry-After': '1'}), (200, {})], retry=retry)
+
+        with h.deadline(0.5):
+            self.assertRaises(APIError, h.request, 'GET', '/users/1')
+
+        self.assertEqual(len(h.session.calls), 1)
+        self.assertEqual(retry.budget.tokens, 1)
+
+        # the budget is exhausted after one more retry
+        h, signed = get_handler([(503, {'Retry-After': '0'})] * 3, retry=retry)
+
+        self.assertRaises(APIError, h.request, 'GET', '/users/1')
+        self.assertEqual(len(h.session.calls), 2)
+        self.assertEqual(retry.budget.tokens, 0)
+
+    def test_deadline(self):
+        from leetchi.api import LeetchiAPI
+        from leetchi.exceptions import DeadlineExceeded
+
+        h = LeetchiAPI(handler.partner_id,
+                       handler.private_key_password,
+                       private_key=handler.private_key,
+                       host=handler.host,
+                       timeout=(5, 30))
+
+        self.assertEqual(h.get_timeout(), (5, 30))
+
+        with h.deadline(10):
+            connect, read = h.get_timeout()
+
+            self.assertEqual(connect, 5)
+            self.assertTrue(read <= 10)
+
+            with h.deadline(60) as deadline:
+                self.assertTrue(deadline.remaining() <= 10)
+
+        with h.deadline(0):
+            self.assertRaises(DeadlineExceeded, h.get_timeout)
+
+    def test_hedging_policy(self):
+        from leetchi.hedging import HedgingPolicy
+
+        policy = HedgingPolicy(percentile=95, min_samples=10, min_delay=0.01)
+
+        for i in range(9):
+            policy.add(0.1)
+
+        self.assertEqual(policy.get_delay(), None)
+
+        policy.add(2)
+
+        self.assertEqual(policy.get_delay(), 2)
+
+        for i in range(10):
+            policy.add(0.001)
+
+        self.assertEqual(policy.get_delay(), 0.1)
+
+    def get_hedged_send(self, attempts):
+        """
+        Return a ``_send`` running ``attempts`` in order, each one a tuple
+        of the seconds it takes and the response or exception it ends with.
+        """
+        import threading
+
+        lock = threading.Lock()
+        calls = []
+
+        def send(method, url, data=None, idempotency_key=None):
+            with lock:
+                seconds, outcome = attempts[len(calls)]
+                calls.append(url)
+
+            time.sleep(seconds)
+
+            if isinstance(outcome, Exception):
+                raise outcome
+
+            return outcome, url, {}, data, seconds
+
+        send.calls = calls
+
+        return send
+
+    def test_hedged_requests(self):
+        from leetchi.exceptions import APIError
+        from leetchi.hedging import HedgingPolicy
+
+        h = get_stub_handler(None)
+
+        def hedge(attempts):
+            # a fresh policy hedging after 50ms, the recorded latencies would change it
+            h.hedging = HedgingPolicy(min_samples=1, min_delay=0.05, max_workers=2)
+            h.hedging.add(0.05)
+
+            h._send = self.get_hedged_send(attempts)
+
+        # the second attempt wins over a slow first one
+        hedge([(0.5, 'slow'), (0, 'fast')])
+
+        start = time.time()
+
+        self.assertEqual(h._send_hedged('GET', '/users/1')[0], 'fast')
+        self.assertTrue(time.time() - start < 0.5)
+        self.assertEqual(len(h._send.calls), 2)
+
+        # a failed attempt falls back on the other one
+        hedge([(0.2, 'slow'), (0, APIError('reset'))])
+
+        self.assertEqual(h._send_hedged('GET', '/users/1')[0], 'slow')
+
+        hedge([(0.1, APIError('reset')), (0.2, 'hedged')])
+
+        self.assertEqual(h._send_hedged('GET', '/users/1')[0], 'hedged')
+
+        # both attempts failed
+        hedge([(0.1, APIError('reset')), (0, APIError('reset'))])
+
+        self.assertRaises(APIError, h._send_hedged, 'GET', '/users/1')
+
+        # no hedging when the first attempt answers in time
+        hedge([(0, 'fast')])
+
+        self.assertEqual(h._send_hedged('GET', '/users/1')[0], 'fast')
+        self.assertEqual(len(h._send.calls), 1)
+
+        h.close()
+
+    def test_async_hedged_requests(self):
+        import sys
+
+        # leetchi.aio requires Python 3.5+
+        if sys.version_info < (3, 5):
+            return
+
+        import asyncio
+
+        from leetchi.aio import AsyncLeetchiAPI
+        from leetchi.exceptions import APIError
+        from leetchi.hedging import HedgingPolicy
+
+        h = AsyncLeetchiAPI(handler.partner_id,
+                            handler.private_key_password,
+                            private_key=handler.private_key)
+
+        loop = asyncio.new_event_loop()
+
+        def hedge(attempts):
+            calls = []
+
+            def send(method, url, data=None, idempotency_key=None):
+                seconds, outcome = attempts[len(calls)]
+                calls.append(url)
+
+                future = loop.create_future()
+
+                def done():
+                    if future.done():
+                        return
+
+                    if isinstance(outcome, Exception):
+                        future.set_exception(outcome)
+                    else:
+                        future.set_result((outcome, url, {}, data, seconds))
+
+                loop.call_later(seconds, done)
+
+                return future
+
+            h.hedging = HedgingPolicy(min_samples=1, min_delay=0.05)
+            h.hedging.add(0.05)
+
+            h._send = send
+
+        try:
+            hedge([(0.5, 'slow'), (0, 'fast')])
+
+            start = time.time()
+
+            self.assertEqual(loop.run_until_complete(h._send_hedged('GET', '/users/1'))[0], 'fast')
+            self.assertTrue(time.time() - start < 0.5)
+
+            hedge([(0.2, 'slow'), (0, APIError('reset'))])
+
+            self.assertEqual(loop.run_until_complete(h._send_hedged('GET', '/users/1'))[0], 'slow')
+
+            hedge([(0.1, APIError('reset')), (0.2, 'hedged')])
+
+            self.assertEqual(loop.run_until_complete(h._send_hedged('GET', '/users/1'))[0], 'hedged')
+        finally:
+            loop.close()
+
+    def test_async_batching_projection(self):
+        import sys
+
+        # leetchi.aio requires Python 3.5+
+        if sys.version_info < (3, 5):
+            return
+
+        import asyncio
+
+        from leetchi.aio import AsyncLeetchiAPI
+        from leetchi.resources import User
+
+        h = AsyncLeetchiAPI(handler.partner_id,
+                            handler.private_key_password,
+                            private_key=handler.private_key)
+
+        loop = asyncio.get_event_loop()
+
+        urls = []
+
+        def request(method, url, data=None, idempotency_key=None):
+            urls.append(url)
+
+            future = loop.create_future()
+            future.set_result((StubResponse(), {'ID': 1, 'FirstName': 'Mark', 'LastName': 'Zuckerberg'}))
+
+            return future
+
+        h.request = request
+
+        with h.batching():
+            projected, user, other = loop.run_until_complete(asyncio.gather(
+                User.select().only('first_name').aget(1, handler=h),
+                User.select().aget(1, handler=h),
+                User.select().aget(1, handler=h)))
+
+        self.assertEqual(len(urls), 2)
+        self.assertEqual(projected.get_loaded_fields(), frozenset(['id', 'first_name']))
+        self.assertEqual(user.last_name, 'Zuckerberg')
+        self.assertEqual(user.get_loaded_fields(), None)
+        self.assertTrue(other is user)
+
+    def test_singleflight(self):
+        import threading
+
+        from leetchi.utils import SingleFlight
+
+        singleflight = SingleFlight()
+        calls = []
+        results = []
+
+        def fetch():
+            calls.append(1)
+            time.sleep(0.2)
+            return {'ID': 1}
+
+        threads = [threading.Thread(target=lambda: results.append(singleflight.do('/wallets/1', fetch)))
+                   for i in range(10)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'ID': 1}] * 10)
+
+    def test_singleflight_deadline(self):
+        import threading
+
+        from leetchi.deadline import deadline
+        from leetchi.exceptions import DeadlineExceeded
+        from leetchi.utils import SingleFlight
+
+        singleflight = SingleFlight()
+        errors = []
+
+        def fetch():
+            time.sleep(0.5)
+            return {'ID': 1}
+
+        leader = threading.Thread(target=lambda: singleflight.do('/wallets/1', fetch))
+        leader.start()
+
+        time.sleep(0.05)
+
+        def follow():
+            with deadline(0.1):
+                try:
+                    singleflight.do('/wallets/1', fetch)
+                except DeadlineExceeded as e:
+                    errors.append(e)
+
+        start = time.time()
+
+        follower = threading.Thread(target=follow)
+        follower.start()
+        follower.join()
+
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(time.time() - start < 0.4)
+
+        leader.join()
+
+    def test_coalesced_requests(self):
+        import threading
+
+        from leetchi.resources import User
+
+        def respond(method, url, **kwargs):
+            time.sleep(0.2)
+
+            return StubResponse(content={'ID': 1, 'FirstName': 'Mark'})
+
+        h = get_stub_handler(respond, coalesce=True)
+
+        users = []
+
+        threads = [threading.Thread(target=lambda: users.append(User.get(1, handler=h)))
+                   for i in range(5)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(h.session.calls), 1)
+        self.assertEqual([user.first_name for user in users], ['Mark'] * 5)
+
+        User.get(1, handler=h)
+
+        self.assertEqual(len(h.session.calls), 2)
+
+    def test_coalesced_requests_copy(self):
+        import threading
+
+        from leetchi.resources import Wallet
+
+        def respond(method, url, **kwargs):
+            time.sleep(0.2)
+
+            return StubResponse(content={'ID': 1, 'Name': 'Wallet', 'Owners': [1, 2]})
+
+        h = get_stub_handler(respond, coalesce=True)
+
+        wallets = []
+
+        threads = [threading.Thread(target=lambda: wallets.append(Wallet.get(1, handler=h)))
+                   for i in range(3)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(h.session.calls), 1)
+        self.assertEqual([wallet.users_ids for wallet in wallets], [[1, 2]] * 3)
+        self.assertEqual(len(set(id(wallet.users_ids) for wallet in wallets)), 3)
+
+    def test_async_coalesced_requests_copy(self):
+        import sys
+
+        # leetchi.aio requires Python 3.5+
+        if sys.version_info < (3, 5):
+            return
+
+        import asyncio
+
+        from leetchi.aio import AsyncLeetchiAPI
+
+        h = AsyncLeetchiAPI(handler.partner_id,
+                            handler.private_key_password,
+                            private_key=handler.private_key,
+                            coalesce=True)
+
+        loop = asyncio.get_event_loop()
+
+        calls = []
+
+        def request(method, url, data=None, idempotency_key=None):
+            calls.append(url)
+
+            future = loop.create_future()
+
+            loop.call_later(0.05, future.set_result, (StubResponse(), {'ID': 1, 'Owners': [1, 2]}))
+
+            return future
+
+        h._request = request
+
+        responses = loop.run_until_complete(asyncio.gather(*[h.request('GET', '/wallets/1')
+                                                             for i in range(3)]))
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([data for result, data in responses], [{'ID': 1, 'Owners': [1, 2]}] * 3)
+        self.assertEqual(len(set(id(data['Owners']) for result, data in responses)), 3)
+
+    def test_lru_cache(self):
+        from leetchi.cache import LRUCache
+        from leetchi.resources import User, Wallet
+
+        cache = LRUCache(maxsize=2, ttl=60, ttls={Wallet: 0})
+
+        cache.set(User, 1, {'first_name': 'Mark'})
+        cache.set(Wallet, 1, {'name': 'Wallet'})
+
+        self.assertEqual(cache.get(User, 1), {'first_name': 'Mark'})
+        self.assertEqual(cache.get(Wallet, 1), None)
+
+        cache.set(User, 2, {'first_name': 'Mike'})
+        cache.set(User, 3, {'first_name': 'Bill'})
+
+        self.assertEqual(cache.get(User, 1), None)
+        self.assertEqual(cache.get_stats(), {'hits': 1, 'misses': 2, 'size': 2})
+
+        # the mutable values are not shared with the cache
+        value = {'first_name': 'Mark', 'users_ids': [1, 2]}
+
+        cache.set(User, 4, value)
+        value['users_ids'].append(3)
+
+        self.assertEqual(cache.get(User, 4)['users_ids'], [1, 2])
+
+        cache.get(User, 4)['users_ids'].append(3)
+        cache.get_entry(User, 4)[0]['users_ids'].append(3)
+
+        self.assertEqual(cache.get(User, 4), {'first_name': 'Mark', 'users_ids': [1, 2]})
+
+    def test_iter_json_array(self):
+        import json
+
+        from leetchi.utils import iter_json_array
+
+        entries = [{'ID': i, 'Tag': u'op\xe9ration'} for i in range(10)] + [1234, None, 12.5, -3e-05, True, u'x']
+
+        content = json.dumps(entries).encode('utf-8')
+
+        for size in (1, 3, 64):
+            chunks = [content[i:i + size] for i in range(0, len(content), size)]
+
+            self.assertEqual(list(iter_json_array(chunks)), entries)
+
+        # numbers split across chunks
+        self.assertEqual(list(iter_json_array([b'[1.', b'5]'])), [1.5])
+        self.assertEqual(list(iter_json_array([b'[1', b'e3, 2', b'0]'])), [1000.0, 20])
+
+        self.assertRaises(ValueError, list, iter_json_array([b'[{"ID": 1}']))
+        self.assertRaises(ValueError, list, iter_json_array([b'[1.']))
+        self.assertRaises(ValueError, list, iter_json_array([b'{"ID": 1}']))
+
+    def test_codecs(self):
+        from leetchi.serializers import get_available_codecs, get_codec
+
+        data = {
+            'FirstName': u'M\xe9l',
+            'Tag': 'custom_information',
+        }
+
+        for backend in get_available_codecs():
+            codec = get_codec(backend)
+
+            body = codec.dumps(data)
+
+            self.assertTrue(isinstance(body, bytes))
+            self.assertEqual(codec.loads(body), data)
+
+        self.assertEqual(handler._format_data('POST', '/users/', handler.codec.dumps(data)),
+                         handler._format_data('POST', '/users/', data))
+
+        self.assertRaises(ValueError, get_codec, 'unknown')
+
+    def test_compiled_decoder(self):
+        import datetime
+
+        from leetchi.resources import Operation
+        from leetchi.query import SelectQuery
+
+        result = {
+            'ID': '1',
+            'UserID': 2,
+            'WalletID': 3,
+            'Amount': 1000,
+            'TransactionType': 'contribution',
+            'CreationDate': '2014-01-02 03:04:05.123',
+        }
+
+        pairs = SelectQuery(Operation).parse_result(result)
+
+        self.assertEqual(pairs, dict((field.name, field.python_value(result[field.api_name]))
+                                     for field in Operation._meta.fields.values()
+                                     if field.api_name in result))
+
+        self.assertEqual(pairs['id'], 1)
+        self.assertEqual(pairs['creation_date'], datetime.datetime(2014, 1, 2, 3, 4, 5))
+        self.assertEqual(SelectQuery(Operation).parse_result(None), {})
+
+    def test_compiled_encoder(self):
+        from leetchi.resources import User, Wallet
+
+        user = User(id=1, first_name='Mark', last_name='Zuckerberg', email='mark@leetchi.com')
+
+        wallet = Wallet(name='Mark Zuckerberg wallet', users=[user], raising_goal_amount=1200)
+
+        query, created = wallet.get_save_query()
+
+        payload = query.parse_insert()
+
+        self.assertEqual(payload['Owners'], [1])
+        self.assertEqual(payload['RaisingGoalAmount'], 1200)
+        self.assertEqual(payload, dict((field.api_name, field.api_value(value))
+                                       for field, value in ((Wallet._meta.get_field_by_name(k), v)
+                                                            for k, v in wallet.get_save_fields().items())
+                                       if field.required or value is not None))
+
+        self.assertEqual(Wallet.encode_many([wallet, wallet]), [payload, payload])
+
+        self.assertRaises(AttributeError, Wallet._meta.encoder, {'unknown': 1})
+
+    def test_identity_map_per_handler(self):
+        h = get_stub_handler(None)
+        other = get_stub_handler(None)
+
+        with h.identity_map() as identity_map:
+            self.assertTrue(h.get_identity_map() is identity_map)
+            self.assertEqual(other.get_identity_map(), None)
+
+            with other.identity_map() as other_identity_map:
+                self.assertFalse(other_identity_map is identity_map)
+
+                with h.identity_map() as nested:
+                    self.assertTrue(nested is identity_map)
+
+            self.assertEqual(other.get_identity_map(), None)
+
+        self.assertEqual(h.get_identity_map(), None)
+
+    def test_identity_map_keeps_changes(self):
+        from leetchi.resources import User
+
+        h = get_stub_handler(lambda method, url, **kwargs: StubResponse(content={
+            'ID': 1, 'FirstName': 'Mark', 'Tag': 'server'}))
+
+        with h.identity_map():
+            user = User.get(1, handler=h)
+            user.tag = 'local change'
+
+            self.assertTrue(User.get(1, handler=h) is user)
+
+        self.assertEqual(user.tag, 'local change')
+        self.assertEqual(user.first_name, 'Mark')
+        self.assertEqual(user.get_dirty_fields(), set(['tag']))
+
+    def test_model_hash(self):
+        from leetchi.resources import User
+
+        user = User(first_name='Mark')
+
+        self.assertRaises(TypeError, hash, user)
+
+        user.id = 1
+
+        self.assertEqual(hash(user), hash(User(id=1)))
+        self.assertEqual(set([user, User(id=1)]), set([user]))
+
+    def test_dirty_fields(self):
+        from leetchi.resources import User
+        from leetchi.query import SelectQuery
+
+        user = SelectQuery(User).build_instance({'id': 1, 'first_name': 'Mark', 'tag': 'user'}, handler)
+
+        self.assertFalse(user.is_dirty())
+        self.assertEqual(user.save(handler), {})
+
+        user.tag = 'updated user'
+
+        self.assertEqual(user.get_dirty_fields(), set(['tag']))
+
+        query, created = user.get_save_query()
+
+        self.assertFalse(created)
+        self.assertEqual(set(query.update_query), set(['tag']) | User._meta.required_fields)
+
+    def test_lazy_decoding(self):
+        import datetime
+
+        from leetchi.resources import Operation
+        from leetchi.query import SelectQuery
+
+        entry = {
+            'ID': 1,
+            'UserID': 2,
+            'Amount': 1000,
+            'CreationDate': '2014-01-02 03:04:05.123',
+        }
+
+        operation = SelectQuery(Operation).lazy().build_result(entry, handler)
+
+        self.assertEqual(operation._data, {})
+        self.assertEqual(operation.amount, 1000)
+        self.assertEqual(operation._data, {'amount': 1000})
+        self.assertEqual(operation.creation_date, datetime.datetime(2014, 1, 2, 3, 4, 5))
+        self.assertFalse(operation.is_dirty())
+
+        self.assertEqual(operation.get_field_dict(),
+                         SelectQuery(Operation).build_result(entry, handler).get_field_dict())
+
+    def test_projection(self):
+        from leetchi.resources import Operation, User
+        from leetchi.query import SelectQuery
+
+        entry = {
+            'ID': 1,
+            'UserID': 2,
+            'WalletID': 3,
+            'Amount': 1000,
+            'TransactionType': 'contribution',
+            'CreationDate': '2014-01-02 03:04:05.123',
+        }
+
+        operation = SelectQuery(Operation).only('amount', 'wallet').build_result(entry, handler)
+
+        self.assertEqual(operation._data, {'id': 1, 'wallet_id': 3, 'amount': 1000})
+        self.assertEqual(operation.transaction_type, None)
+
+        operation = SelectQuery(Operation).defer('creation_date', 'user').build_result(entry, handler)
+
+        self.assertEqual(operation.creation_date, None)
+        self.assertEqual(operation.user_id, None)
+        self.assertEqual(operation.wallet_id, 3)
+
+        user = SelectQuery(User).only('first_name').build_result({'ID': 1, 'FirstName': 'Mark'}, handler)
+
+        self.assertEqual(user.type, None)
+
+        user.first_name = 'Mike'
+
+        query, created = user.get_save_query()
+
+        self.assertEqual(query.parse_update(), {'FirstName': 'Mike'})
+
+        self.assertRaises(AttributeError, SelectQuery(User).only, 'unknown')
+
+    def test_projected_update_url(self):
+        from leetchi.resources import StrongAuthentication
+
+        def respond(method, url, **kwargs):
+            return StubResponse(content={'ID': 5, 'UserID': 1, 'Message': 'sent', 'IsCompleted': False})
+
+        h = get_stub_handler(respond)
+
+        authentication = StrongAuthentication.select().only('message').get(5, handler=h, user_id=1)
+
+        self.assertEqual(authentication.user_id, 1)
+
+        authentication.message = 'changed'
+        authentication.save(h)
+
+        method, url, kwargs = h.session.calls[-1]
+
+        self.assertEqual(method, 'PUT')
+        self.assertTrue('/users/1/strongAuthentication' in url)
+        self.assertEqual(json.loads(kwargs['data']), {'Message': 'changed', 'UserID': 1})
+
+    def test_records(self):
+        from array import array
+
+        from leetchi.resources import Operation, Wallet
+        from leetchi.query import SelectQuery
+
+        entry = {
+            'ID': 1,
+            'UserID': 2,
+            'WalletID': 3,
+            'Amount': 1000,
+        }
+
+        record = SelectQuery(Operation).records().build_result(entry, handler)
+
+        self.assertFalse(hasattr(record, '__dict__'))
+        self.assertRaises(AttributeError, setattr, record, 'amount', 2000)
+        self.assertRaises(AttributeError, delattr, record, 'amount')
+        self.assertEqual(record.amount, 1000)
+        self.assertEqual(record.get_field_dict(),
+                         SelectQuery(Operation).build_result(entry, handler).get_field_dict())
+        self.assertEqual(record.to_model(), SelectQuery(Operation).build_result(entry, handler))
+
+        wallet = SelectQuery(Wallet).records().build_result({'ID': 1, 'Owners': [1, 2]}, handler)
+
+        self.assertTrue(isinstance(wallet.users_ids, array))
+        self.assertEqual(wallet.to_model().users_ids, [1, 2])
+
+        self.assertRaises(TypeError, hash, SelectQuery(Wallet).records().build_result({'Name': 'Wallet'}, handler))
+
+        # a model built from a projected record does not send the required fields projected out
+        h = get_stub_handler(lambda method, url, **kwargs: StubResponse(content={'ID': 1, 'Amount': 2000}))
+
+        wallet = SelectQuery(Wallet).records().only('amount').build_result({'ID': 1, 'Amount': 1000}, h)
+
+        self.assertEqual(wallet, SelectQuery(Wallet).records().build_result({'ID': 1}, h))
+        self.assertEqual(hash(wallet), hash(SelectQuery(Wallet).records().build_result({'ID': 1}, h)))
+
+        instance = wallet.to_model()
+
+        self.assertEqual(instance.get_loaded_fields(), frozenset(['id', 'amount']))
+
+        instance.amount = 2000
+        instance.save(h)
+
+        method, url, kwargs = h.session.calls[-1]
+
+        self.assertEqual(json.loads(kwargs['data']), {'Amount': 2000})
+
+    def test_paginated_iterator(self):
+        import re
+
+        from leetchi.resources import Operation, User
+
+        entries = [{'ID': i, 'Amount': i * 100} for i in range(1, 13)]
+
+        def paginate(method, url, **kwargs):
+            page, per_page = map(int, re.search(r'page=(\d+)&per_page=(\d+)', url).groups())
+
+            return StubResponse(content=entries[(page - 1) * per_page:page * per_page])
+
+        h = get_stub_handler(paginate)
+
+        operations = Operation.select().iterator(1, User, handler=h, per_page=5)
+
+        self.assertEqual([operation.get_pk() for operation in operations], list(range(1, 13)))
+
+        del h.session.calls[:]
+
+        operations = Operation.select().iterator(1, User, handler=h, per_page=5)
+
+        # a slice starting on the second page only retrieves the pages it needs
+        self.assertEqual([operation.get_pk() for operation in operations[6:9]], [7, 8, 9])
+        self.assertEqual([re.search(r'page=(\d+)', url).group(1) for method, url, kw in h.session.calls],
+                         ['1', '2'])
+
+        self.assertEqual(len(operations), 12)
+        self.assertEqual(operations[-1].get_pk(), 12)
+        self.assertEqual(operations[12:20], [])
+        self.assertRaises(IndexError, operations.__getitem__, 12)
+
+        operations = Operation.select().iterator(1, User, handler=h, per_page=4)
+
+        self.assertEqual(len(operations), 12)
+        self.assertEqual(len(list(operations)), 12)
+
+    def test_iterator_paging_ignored(self):
+        from leetchi.resources import Operation, User
+
+        for count in (5, 7, 3):
+            entries = [{'ID': i} for i in range(count)]
+
+            h = get_stub_handler(lambda method, url, **kwargs: StubResponse(content=entries))
+
+            operations = Operation.select().iterator(1, User, handler=h, per_page=5)
+
+            self.assertEqual([operation.get_pk() for operation in operations], list(range(count)))
+            self.assertEqual(len(operations), count)
+            self.assertEqual([operation.get_pk() for operation in operations[2:7]], list(range(count))[2:7])
+            self.assertEqual([operation.get_pk() for operation in operations[5:]], list(range(count))[5:])
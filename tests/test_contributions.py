@@ -136,3 +136,38 @@ class ContributionsTest(unittest.TestCase):
             self.assertEqual(wallet.collected_amount, 1000)
             self.assertEqual(wallet.amount, 1000)
             self.assertEqual(wallet.spent_amount, 0)
+
+    def test_prefetch_contributions(self):
+        user = User(**{
+            'first_name': 'Mark',
+            'last_name': 'Zuckerberg',
+            'email': 'mark@leetchi.com',
+            'ip_address': '127.0.0.1',
+            'tag': 'custom_information',
+        })
+        user.save(handler)
+
+        wallet = Wallet(**{
+            'tag': 'user',
+            'name': 'Mark Zuckerberg wallet',
+            'description': 'Wallet of Mark Zuckerberg',
+            'raising_goal_amount': 1200,
+            'users': [user]
+        })
+        wallet.save(handler=handler)
+
+        for i in range(3):
+            Contribution(**{
+                'user': user,
+                'wallet': wallet,
+                'amount': 1000,
+                'return_url': 'http://ulule.com',
+            }).save(handler)
+
+        contributions = wallet.contributions.prefetch('user', 'wallet')
+
+        self.assertEqual(len(contributions), 3)
+
+        for contribution in contributions:
+            self.assertEqual(contribution._cache_user_id, user)
+            self.assertEqual(contribution._cache_wallet_id, wallet)
@@ -123,3 +123,160 @@ class UsersTest(unittest.TestCase):
 
         for key, value in params.items():
             self.assertEqual(getattr(user, key), value)
+
+    def test_async_retrieve_user(self):
+        import sys
+
+        # leetchi.aio requires Python 3.5+
+        if sys.version_info < (3, 5):
+            return
+
+        import asyncio
+
+        from leetchi.aio import AsyncLeetchiAPI
+
+        user = User(**{
+            'first_name': 'Mark',
+            'last_name': 'Zuckerberg',
+            'email': 'mark@leetchi.com',
+            'ip_address': '127.0.0.1',
+            'tag': 'custom_information',
+            'nationality': 'FR',
+        })
+        user.save(handler)
+
+        async_handler = AsyncLeetchiAPI(handler.partner_id,
+                                        handler.private_key_password,
+                                        private_key=handler.private_key,
+                                        host=handler.host)
+
+        loop = asyncio.get_event_loop()
+
+        try:
+            users = loop.run_until_complete(asyncio.gather(*[User.select().aget(user.get_pk(), handler=async_handler)
+                                                             for i in range(3)]))
+
+            users[0].first_name = 'Mike'
+            loop.run_until_complete(users[0].asave())
+        finally:
+            loop.run_until_complete(async_handler.aclose())
+
+        self.assertEqual(users, [user] * 3)
+        self.assertEqual(users[0].first_name, 'Mike')
+
+    def test_async_batching(self):
+        import sys
+
+        # leetchi.aio requires Python 3.5+
+        if sys.version_info < (3, 5):
+            return
+
+        import asyncio
+
+        from leetchi.aio import AsyncLeetchiAPI
+
+        user = User(**{
+            'first_name': 'Mark',
+            'last_name': 'Zuckerberg',
+            'email': 'mark@leetchi.com',
+            'ip_address': '127.0.0.1',
+            'nationality': 'FR',
+        })
+        user.save(handler)
+
+        async_handler = AsyncLeetchiAPI(handler.partner_id,
+                                        handler.private_key_password,
+                                        private_key=handler.private_key,
+                                        host=handler.host)
+
+        loop = asyncio.get_event_loop()
+
+        try:
+            with async_handler.batching(concurrency=2):
+                users = loop.run_until_complete(asyncio.gather(
+                    User.select().aget(user.get_pk(), handler=async_handler),
+                    User.select().aget(user.get_pk(), handler=async_handler),
+                    User.select().aget(user.get_pk() + 1000, handler=async_handler),
+                    return_exceptions=True))
+        finally:
+            loop.run_until_complete(async_handler.aclose())
+
+        self.assertEqual(users[:2], [user] * 2)
+        self.assertTrue(isinstance(users[2], User.DoesNotExist))
+
+    def test_negative_cache(self):
+        from leetchi.api import LeetchiAPI
+        from leetchi.cache import NegativeCache
+
+        h = LeetchiAPI(handler.partner_id,
+                       handler.private_key_password,
+                       private_key=handler.private_key,
+                       host=handler.host,
+                       negative_cache=NegativeCache(ttl=60))
+
+        user = User(**{
+            'first_name': 'Mark',
+            'last_name': 'Zuckerberg',
+            'email': 'mark@leetchi.com',
+            'ip_address': '127.0.0.1',
+            'nationality': 'FR',
+        })
+        user.save(h)
+
+        for i in range(2):
+            self.assertRaises(User.DoesNotExist, User.get, user.get_pk() + 1000, handler=h)
+
+        self.assertEqual(h.negative_cache.get_stats(), {'hits': 1, 'misses': 1, 'size': 1})
+
+        User(**{
+            'first_name': 'Mike',
+            'last_name': 'Zuckerberg',
+            'email': 'mike@leetchi.com',
+            'ip_address': '127.0.0.1',
+            'nationality': 'FR',
+        }).save(h)
+
+        self.assertEqual(len(h.negative_cache), 0)
+
+    def test_identity_map(self):
+        user = User(**{
+            'first_name': 'Mark',
+            'last_name': 'Zuckerberg',
+            'email': 'mark@leetchi.com',
+            'ip_address': '127.0.0.1',
+            'nationality': 'FR',
+        })
+        user.save(handler)
+
+        with handler.identity_map() as identity_map:
+            first = User.get(user.get_pk(), handler=handler)
+            second = User.get(user.get_pk(), handler=handler)
+
+            self.assertTrue(first is second)
+            self.assertTrue(first in identity_map)
+
+        self.assertFalse(User.get(user.get_pk(), handler=handler) is first)
+
+        self.assertEqual(len(set([first, user])), 1)
+
+    def test_get_many(self):
+        users = []
+
+        for first_name in ('Mark', 'Bill'):
+            user = User(**{
+                'first_name': first_name,
+                'last_name': 'Zuckerberg',
+                'email': 'mark@leetchi.com',
+                'ip_address': '127.0.0.1',
+                'nationality': 'FR',
+            })
+            user.save(handler)
+
+            users.append(user)
+
+        references = [users[1].get_pk(), users[0].get_pk(), users[1].get_pk() + 1000]
+
+        result = User.select().get_many(references, handler=handler, concurrency=2)
+
+        self.assertEqual(result[:2], [users[1], users[0]])
+        self.assertTrue(isinstance(result[2], User.DoesNotExist))
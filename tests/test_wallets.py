@@ -46,6 +46,12 @@ class WalletsTest(unittest.TestCase):
 
         self.assertEqual(w.users, [user])
 
+        users = w.users
+
+        self.assertEqual(len(users), 1)
+        self.assertEqual(users[0], user)
+        self.assertEqual(users[-1:], [user])
+
     def test_related_wallet(self):
         user = User(**{
             'first_name': 'Mark',
@@ -69,3 +75,42 @@ class WalletsTest(unittest.TestCase):
         user = User.get(user.get_pk(), handler=handler)
 
         self.assertEqual(user.wallets, [wallet])
+
+    def test_stale_wallet(self):
+        import time
+
+        from leetchi.api import LeetchiAPI
+        from leetchi.cache import LRUCache
+
+        h = LeetchiAPI(handler.partner_id,
+                       handler.private_key_password,
+                       private_key=handler.private_key,
+                       host=handler.host,
+                       cache=LRUCache(ttl=0))
+
+        user = User(**{
+            'first_name': 'Mark',
+            'last_name': 'Zuckerberg',
+            'email': 'mark@leetchi.com',
+            'ip_address': '127.0.0.1',
+            'tag': 'custom_information'
+        })
+        user.save(h)
+
+        wallet = Wallet(**{
+            'tag': 'user',
+            'name': 'Mark Zuckerberg wallet',
+            'description': 'Wallet of Mark Zuckerberg',
+            'raising_goal_amount': 1200,
+            'users': [user]
+        })
+        wallet.save(h)
+
+        time.sleep(0.1)
+
+        w = Wallet.select().get_stale(wallet.get_pk(), h, max_staleness=60)
+
+        self.assertEqual(w.get_pk(), wallet.get_pk())
+        self.assertEqual(h.cache.get_stats()['hits'], 1)
+
+        h.close()